@@ -29,7 +29,14 @@ from homeassistant.core import Event, HomeAssistant, ServiceCall, callback
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.event import async_track_time_interval
 
-from .coordinator import TuyaDevice, HassLocalTuyaData, TuyaCloudApi
+from .coordinator import (
+    DeviceProfiles,
+    HassLocalTuyaData,
+    StartupScheduler,
+    TuyaCloudApi,
+    TuyaDevice,
+    UpdateBatcher,
+)
 from .config_flow import ENTRIES_VERSION
 from .const import (
     ATTR_UPDATED_AT,
@@ -39,6 +46,7 @@ from .const import (
     CONF_PRODUCT_KEY,
     CONF_USER_ID,
     DATA_DISCOVERY,
+    DATA_LIVE_UPDATES,
     DOMAIN,
     PLATFORMS,
 )
@@ -66,6 +74,7 @@ async def async_setup(hass: HomeAssistant, config: dict):
 
     current_entries = hass.config_entries.async_entries(DOMAIN)
     device_cache = {}
+    live_updates = hass.data[DOMAIN].setdefault(DATA_LIVE_UPDATES, {})
 
     async def _handle_reload(service: ServiceCall):
         """Handle reload service call."""
@@ -134,12 +143,9 @@ async def async_setup(hass: HomeAssistant, config: dict):
         if not entry.state == ConfigEntryState.LOADED:
             return
 
-        if device := hass_data.devices.get(device_ip):
-            ...
-
         # hass.create_task(hass_data.cloud_data.async_get_devices_list())
         new_data = entry.data.copy()
-        updated = False
+        updated = product_updated = False
         for dev_id, host in device_cache[device_id].items():
             if dev_id not in entry.data[CONF_DEVICES]:
                 continue
@@ -150,16 +156,24 @@ async def async_setup(hass: HomeAssistant, config: dict):
                 device_cache[device_id][dev_id] = device_ip
 
             if (p_key := dev_entry.get(CONF_PRODUCT_KEY)) and p_key != product_key:
-                updated = True
+                updated = product_updated = True
                 new_data[CONF_DEVICES][dev_id][CONF_PRODUCT_KEY] = product_key
-        # Update settings if something changed, otherwise try to connect. Updating
-        # settings triggers a reload of the config entry, which tears down the device
-        # so no need to connect in that case.
+
+        # Apply the address to the running devices and wake them up if offline.
+        last_seen = discovery.last_seen.get(device_id, 0.0)
+        live = _update_live_devices(
+            hass_data, device_cache[device_id], device_ip, last_seen
+        )
+
+        # Save the new settings, skip the reload if the devices already use them.
+        # Only the address is applied live, a new product key needs a reload.
         if updated:
             _LOGGER.debug(
                 "Updating keys for device %s: %s %s", device_id, device_ip, product_key
             )
             new_data[ATTR_UPDATED_AT] = str(int(time.time() * 1000))
+            if live and not product_updated:
+                live_updates[entry.entry_id] = new_data[ATTR_UPDATED_AT]
             hass.config_entries.async_update_entry(entry, data=new_data)
 
     def _shutdown(event):
@@ -316,7 +330,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
             hass, tuya_api.async_connect(), "localtuya-cloudAPI"
         )
 
-    hass_localtuya = HassLocalTuyaData(tuya_api, {})
+    profiles = DeviceProfiles(hass, entry.entry_id)
+    await profiles.async_load()
+    startup = StartupScheduler()
+    updates = UpdateBatcher()
+    hass_localtuya = HassLocalTuyaData(tuya_api, {}, profiles, startup, updates)
     hass.data[DOMAIN][entry.entry_id] = hass_localtuya
 
     def _setup_devices(entry_devices: dict):
@@ -362,8 +380,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
 
     # Note: entry.async_on_unload items are called in LIFO order!
 
+    # Connect in the background, a bounded number of devices at once.
+    entry.async_create_background_task(
+        hass, startup.async_run(connect_to_devices), "localtuya-startup"
+    )
     for dev in connect_to_devices:
-        entry.async_create_task(hass, dev.async_connect())
         entry.async_on_unload(dev.close)
 
     entry.async_on_unload(entry.add_update_listener(update_listener))
@@ -392,11 +413,56 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return True
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored device profiles of a removed entry."""
+    await DeviceProfiles(hass, entry.entry_id).async_remove()
+
+
 async def update_listener(hass: HomeAssistant, config_entry: ConfigEntry):
     """Update listener."""
+    # Changes made from discovery are already applied to the running devices.
+    live_updates = hass.data[DOMAIN].get(DATA_LIVE_UPDATES, {})
+    updated_at = config_entry.data.get(ATTR_UPDATED_AT)
+    if live_updates.pop(config_entry.entry_id, None) == updated_at:
+        return
+
     await hass.config_entries.async_reload(config_entry.entry_id)
 
 
+@callback
+def _update_live_devices(
+    hass_data: HassLocalTuyaData, dev_ids, device_ip: str, last_seen: float
+) -> bool:
+    """Point the running devices of dev_ids to device_ip and wake up offline ones.
+
+    Return False, changing nothing, if another device still runs at device_ip,
+    e.g. two devices swapped addresses. The entry has to be reloaded then.
+    """
+    devices = hass_data.devices
+    # Devices are stored by host, or host_nodeID for sub-devices.
+    moves = {
+        key: device_ip + key[len(device.host) :]
+        for key, device in devices.items()
+        if device.id in dev_ids and device.host != device_ip
+    }
+    if any(new_key in devices for new_key in moves.values()):
+        return False
+
+    for key, device in list(devices.items()):
+        if device.id not in dev_ids:
+            continue
+
+        if key in moves:
+            device.info(f"IP has been updated to: {device_ip}")
+            device.update_host(device_ip)
+            devices[moves[key]] = devices.pop(key)
+            # Nothing was heard from the device at the new address yet.
+            device.discovered(0.0)
+        else:
+            device.discovered(last_seen)
+    return True
+
+
 async def async_remove_config_entry_device(
     hass: HomeAssistant, config_entry: ConfigEntry, device_entry: dr.DeviceEntry
 ) -> bool:
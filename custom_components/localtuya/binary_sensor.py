@@ -18,7 +18,6 @@ from homeassistant.components.binary_sensor import (
 from .entity import LocalTuyaEntity, async_setup_entry
 from .const import CONF_STATE_ON, CONF_RESET_TIMER
 
-
 CONF_STATE_OFF = "state_off"
 
 _LOGGER = logging.getLogger(__name__)
@@ -78,9 +77,10 @@ class LocalTuyaBinarySensor(LocalTuyaEntity, BinarySensorEntity):
             @callback
             def async_reset_state(now):
                 """Set the state of the entity to off."""
-                # "_update_handler" logic, if status hasn't changed "status_updated" will not be called.
-                # Maybe we can find better solution then this workaround?
+                # Only this entity sees the reset, the next report turns it on again
+                # even if the device value didn't change.
                 self._status[self._dp_id] = "reset_state_binary_sensor"
+                self._device.refresh_dp(self._dp_id)
                 self._is_on = False
                 self.async_write_ha_state()
 
@@ -75,6 +75,11 @@ from .const import (
     PLATFORMS,
     SUPPORTED_PROTOCOL_VERSIONS,
     CONF_DEVICE_SLEEP_TIME,
+    CONF_BATCH_WRITES,
+    CONF_COMMAND_WINDOW,
+    CONF_ENABLE_EVENTS,
+    CONF_EVENT_DPS,
+    CONF_FRAME_VERIFICATION,
 )
 from .discovery import discover
 
@@ -92,6 +97,9 @@ EXPORT_CONFIG = "export_config"
 TUYA_CATEGORY = "category"
 DEVICE_CLOUD_DATA = "device_cloud_data"
 
+# Devices validated at once when configuring devices in bulk.
+VALIDATE_CONCURRENCY = 8
+
 # Using list method so we can translate options.
 CONFIGURE_MENU = [CONF_ADD_DEVICE, CONF_EDIT_DEVICE, CONF_CONFIGURE_CLOUD]
 
@@ -154,6 +162,13 @@ DEVICE_SCHEMA = vol.Schema(
         vol.Optional(CONF_MANUAL_DPS): cv.string,
         vol.Optional(CONF_RESET_DPIDS): str,
         vol.Optional(CONF_DEVICE_SLEEP_TIME): int,
+        vol.Required(CONF_ENABLE_EVENTS, default=False): bool,
+        vol.Optional(CONF_EVENT_DPS): cv.string,
+        vol.Required(CONF_FRAME_VERIFICATION, default="warn"): col_to_select(
+            list(pytuya.FrameVerification)
+        ),
+        vol.Required(CONF_BATCH_WRITES, default=False): bool,
+        vol.Optional(CONF_COMMAND_WINDOW): int,
         vol.Optional(CONF_NODE_ID, default=None): vol.Any(None, cv.string),
     }
 )
@@ -471,7 +486,7 @@ class LocalTuyaOptionsFlowHandler(OptionsFlow):
                         if dev_config.get(res_conf):
                             self.device_data[res_conf] = dev_config.get(res_conf)
                     # Remove the values that assigned as "- or empty space"
-                    for rm_conf in [CONF_RESET_DPIDS, CONF_MANUAL_DPS]:
+                    for rm_conf in [CONF_RESET_DPIDS, CONF_MANUAL_DPS, CONF_EVENT_DPS]:
                         if rm_conf in user_input and user_input[rm_conf] in ["-", " "]:
                             self.device_data.pop(rm_conf)
 
@@ -931,17 +946,17 @@ async def setup_localtuya_devices(
             devices_cfg.append(device_data)
 
     # Connect to the devices to ensure the are usable.
-    validate_devices = [validate_input(hass, entry_id, dev) for dev in devices_cfg]
-    results = await asyncio.gather(*validate_devices, return_exceptions=True)
+    results = await validate_devices(hass, entry_id, devices_cfg)
 
     # Merge test results with devices config
-    for i in range(len(results)):
+    for i, (result, elapsed) in enumerate(results):
         dev_id = devices_cfg[i].get(CONF_DEVICE_ID)
-        if not isinstance(results[i], dict):
-            update_fails(dev_id, results[i])
+        _LOGGER.debug("Validated device %s in %.2f s", dev_id, elapsed)
+        if not isinstance(result, dict):
+            update_fails(dev_id, result)
             continue
 
-        devices.update({dev_id: {**devices_cfg[i], **results[i]}})
+        devices.update({dev_id: {**devices_cfg[i], **result}})
 
     # Configure entities.
     for dev_id, dev_data in deepcopy(devices).items():
@@ -962,6 +977,29 @@ async def setup_localtuya_devices(
     return devices, fails
 
 
+async def validate_devices(
+    hass: HomeAssistant, entry_id, devices_cfg: list[dict], limit=VALIDATE_CONCURRENCY
+) -> list[tuple[dict | Exception, float]]:
+    """Validate devices, returning the result or error and the seconds it took for each.
+
+    At most limit devices are validated at once, and one at a time per host since
+    gateways accept few connections.
+    """
+    slots = asyncio.Semaphore(limit)
+    hosts: dict[str, asyncio.Lock] = {}
+
+    async def validate(data):
+        async with hosts.setdefault(data[CONF_HOST], asyncio.Lock()), slots:
+            started = time.monotonic()
+            try:
+                result = await validate_input(hass, entry_id, data)
+            except Exception as ex:  # pylint: disable=broad-except
+                result = ex
+            return result, time.monotonic() - started
+
+    return await asyncio.gather(*(validate(data) for data in devices_cfg))
+
+
 async def discover_devices() -> tuple[dict[str, dict], dict[str, str]]:
     """Start discovering Tuya devices within the network"""
     errors = {}
@@ -1069,6 +1107,13 @@ def options_schema(entities):
             vol.Optional(CONF_MANUAL_DPS): cv.string,
             vol.Optional(CONF_RESET_DPIDS): cv.string,
             vol.Optional(CONF_DEVICE_SLEEP_TIME): int,
+            vol.Required(CONF_ENABLE_EVENTS, default=False): bool,
+            vol.Optional(CONF_EVENT_DPS): cv.string,
+            vol.Required(CONF_FRAME_VERIFICATION, default="warn"): col_to_select(
+                list(pytuya.FrameVerification)
+            ),
+            vol.Required(CONF_BATCH_WRITES, default=False): bool,
+            vol.Optional(CONF_COMMAND_WINDOW): int,
             vol.Required(
                 CONF_ENTITIES, description={"suggested_value": entity_names}
             ): cv.multi_select(entity_names),
@@ -1189,6 +1234,45 @@ def flow_schema(platform, dps_strings):
     return import_module("." + platform, integration_module).flow_schema(dps_strings)
 
 
+def protocol_versions(hass: HomeAssistant, data) -> list[str]:
+    """Return the protocol versions to try, the version the device broadcasts first."""
+    versions = SUPPORTED_PROTOCOL_VERSIONS
+    if (discovery := hass.data[DOMAIN].get(DATA_DISCOVERY)) is None:
+        return versions
+
+    # Sub-devices use the protocol of their gateway.
+    for dev_id in (data.get(CONF_GATEWAY_ID), data[CONF_DEVICE_ID]):
+        device = discovery.devices.get(dev_id, {})
+        if (version := device.get(CONF_TUYA_VERSION)) in versions:
+            return [version, *(ver for ver in versions if ver != version)]
+    return versions
+
+
+def known_dps(hass: HomeAssistant, entry_id, data) -> list[str]:
+    """Return the DPs known for a device, from the cloud or devices of its product."""
+    cloud_devices = hass.data[DOMAIN][entry_id].cloud_data.device_list
+    product_key = data.get(CONF_PRODUCT_KEY)
+    dps = cloud_devices.get(data[CONF_DEVICE_ID], {}).get("dps_data")
+    if not dps and product_key:
+        # Devices of the same product have the same DPs.
+        products = (
+            dev.get("dps_data")
+            for dev in cloud_devices.values()
+            if dev.get("product_id") == product_key
+        )
+        dps = next(filter(None, products), None)
+    if not dps and product_key:
+        configured = (
+            device.get(CONF_DPS_STRINGS)
+            for entry in hass.config_entries.async_entries(DOMAIN)
+            for device in entry.data[CONF_DEVICES].values()
+            if device.get(CONF_PRODUCT_KEY) == product_key
+        )
+        if dps_strings := next(filter(None, configured), None):
+            dps = [dp.split(" ")[0] for dp in dps_strings]
+    return [dp for dp in dps or () if dp.isdigit()]
+
+
 async def validate_input(hass: HomeAssistant, entry_id, data):
     """Validate the user input allows us to connect."""
     logger = pytuya.ContextualLogger()
@@ -1204,6 +1288,7 @@ async def validate_input(hass: HomeAssistant, entry_id, data):
 
     cid = data.get(CONF_NODE_ID, None)
     localtuya_devices = hass.data[DOMAIN][entry_id].devices
+    dps_hint = known_dps(hass, entry_id, data)
     try:
         conf_protocol = data[CONF_PROTOCOL_VERSION]
         auto_protocol = conf_protocol == "auto"
@@ -1218,9 +1303,11 @@ async def validate_input(hass: HomeAssistant, entry_id, data):
             close = False
         else:
             # If 'auto' will be loop through supported protocols.
-            for ver in SUPPORTED_PROTOCOL_VERSIONS:
+            versions = [conf_protocol]
+            if auto_protocol:
+                versions = protocol_versions(hass, data)
+            for version in versions:
                 try:
-                    version = ver if auto_protocol else conf_protocol
                     interface = await asyncio.wait_for(
                         pytuya.connect(
                             data[CONF_HOST],
@@ -1232,7 +1319,7 @@ async def validate_input(hass: HomeAssistant, entry_id, data):
                         5,
                     )
 
-                    detected_dps = await interface.detect_available_dps(cid=cid)
+                    detected_dps = await interface.detect_available_dps(cid, dps_hint)
 
                     # Break the loop if input isn't auto.
                     if not auto_protocol:
@@ -1276,7 +1363,7 @@ async def validate_input(hass: HomeAssistant, entry_id, data):
 
             # Detect any other non-manual DPS strings
             if not detected_dps:
-                detected_dps = await interface.detect_available_dps(cid=cid)
+                detected_dps = await interface.detect_available_dps(cid, dps_hint)
 
         except (ValueError, pytuya.DecodeError) as ex:
             error = ex
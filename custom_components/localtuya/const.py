@@ -15,6 +15,7 @@ from homeassistant.const import (
 
 DOMAIN = "localtuya"
 DATA_DISCOVERY = "discovery"
+DATA_LIVE_UPDATES = "live_updates"
 
 # Order on priority
 SUPPORTED_PROTOCOL_VERSIONS = ["3.3", "3.1", "3.2", "3.4", "3.5"]
@@ -54,6 +55,10 @@ CONF_TUYA_VERSION = "version"
 # Status Payloads.
 RESTORE_STATES = {"0": "restore"}
 
+# Product keys of devices known to accept frames received back to back, their
+# frames are written in a single batch like with the batch_writes option.
+BATCH_WRITE_PRODUCTS: set[str] = set()
+
 
 # config flow
 CONF_LOCAL_KEY = "local_key"
@@ -78,6 +83,11 @@ CONF_DEFAULT_VALUE = "dps_default_value"
 CONF_RESET_DPIDS = "reset_dpids"
 CONF_PASSIVE_ENTITY = "is_passive_entity"
 CONF_DEVICE_SLEEP_TIME = "device_sleep_time"
+CONF_ENABLE_EVENTS = "enable_events"
+CONF_EVENT_DPS = "event_dps"
+CONF_FRAME_VERIFICATION = "frame_verification"
+CONF_BATCH_WRITES = "batch_writes"
+CONF_COMMAND_WINDOW = "command_window"
 
 # ALARM
 CONF_ALARM_SUPPORTED_STATES = "alarm_supported_states"
@@ -127,6 +137,10 @@ CONF_FAN_DPS_TYPE = "fan_dps_type"
 # sensor
 CONF_SCALING = "scaling"
 CONF_STATE_CLASS = "state_class"
+CONF_PUBLISH_INTERVAL = "publish_interval"
+CONF_DEADBAND = "deadband"
+CONF_DEADBAND_PERCENT = "deadband_percent"
+CONF_WINDOW_AVERAGE = "window_average"
 
 # climate
 CONF_TARGET_TEMPERATURE_DP = "target_temperature_dp"
@@ -230,8 +244,17 @@ class DeviceConfig:
         self.name: str = self.device_config.get(CONF_FRIENDLY_NAME)
         self.node_id: str | None = self.device_config.get(CONF_NODE_ID)
         self.model: str = self.device_config.get(CONF_MODEL, "Tuya generic")
+        self.product_key: str = self.device_config.get(CONF_PRODUCT_KEY, "")
         self.reset_dps: str = self.device_config.get(CONF_RESET_DPIDS, "")
         self.manual_dps: str = self.device_config.get(CONF_MANUAL_DPS, "")
+        self.enable_events: bool = self.device_config.get(CONF_ENABLE_EVENTS, False)
+        self.event_dps: str = self.device_config.get(CONF_EVENT_DPS, "")
+        self.frame_verification: str = self.device_config.get(
+            CONF_FRAME_VERIFICATION, "warn"
+        )
+        self.batch_writes: bool = self.device_config.get(CONF_BATCH_WRITES, False)
+        # Milliseconds to collect DP writes into one command.
+        self.command_window: int = self.device_config.get(CONF_COMMAND_WINDOW, 10)
         self.dps_strings: list = self.device_config.get(CONF_DPS_STRINGS, [])
 
     def as_dict(self):
@@ -2,27 +2,28 @@
 
 from __future__ import annotations
 import asyncio
+import copy
 import errno
 import logging
+import random
 import time
 from datetime import timedelta
-from typing import Any, NamedTuple
+from enum import StrEnum
+from typing import Any, Callable, NamedTuple
 
 
 from homeassistant.core import HomeAssistant, CALLBACK_TYPE, callback, State
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_ID, CONF_DEVICES, CONF_HOST, CONF_DEVICE_ID
 from homeassistant.helpers.event import async_track_time_interval, async_call_later
-from homeassistant.helpers.dispatcher import (
-    async_dispatcher_connect,
-    dispatcher_send,
-)
+from homeassistant.helpers.storage import Store
 
 from .core.cloud_api import TuyaCloudApi
 from .core.pytuya import (
     ContextualLogger,
     DecodeError,
     HEARTBEAT_INTERVAL,
+    MAX_SUBDEVICE_QUERIES,
     TIMEOUT_CONNECT,
     SubdeviceState,
     TuyaListener,
@@ -31,6 +32,7 @@ from .core.pytuya import (
 )
 from .const import (
     ATTR_UPDATED_AT,
+    BATCH_WRITE_PRODUCTS,
     CONF_GATEWAY_ID,
     CONF_LOCAL_KEY,
     CONF_NODE_ID,
@@ -44,8 +46,206 @@ from .const import (
 
 _LOGGER = logging.getLogger(__name__)
 RECONNECT_INTERVAL = timedelta(seconds=5)
+RECONNECT_MAX_INTERVAL = timedelta(minutes=2)
+# Failed reconnects before the host is considered down, then how long to wait
+# for a discovery broadcast from it before trying once more anyway.
+BREAKER_THRESHOLD = 5
+BREAKER_OPEN_INTERVAL = timedelta(minutes=10)
+# A broadcast after this much silence means that the device is back.
+BROADCAST_SILENCE = timedelta(minutes=1)
+# DP changes within this window are fired in one status_update event.
+EVENT_WINDOW = 0.5
+# Status updates of all devices within this window are dispatched in one pass.
+UPDATE_WINDOW = 0.005
 # Subdevice: Offline events before disconnecting the device, around 5 minutes
 MIN_OFFLINE_EVENTS = 5 * 60 // HEARTBEAT_INTERVAL
+PROFILES_STORAGE_VERSION = 1
+PROFILES_SAVE_DELAY = 60
+# Devices connecting at once on startup, and the random delay before each connect.
+STARTUP_CONCURRENCY = 10
+STARTUP_JITTER = 0.1
+
+
+class DeviceProfiles:
+    """Profiles learned from the devices, persisted to warm start the next connect.
+
+    A profile holds the protocol version it was learned with, the dev_type,
+    the detected DPS and the last known status of a device.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        """Initialize the profiles store of a config entry."""
+        self._store = Store(
+            hass, PROFILES_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.profiles"
+        )
+        self._profiles: dict[str, dict[str, Any]] = {}
+        # Devices with changes to save, and the callable building their profile.
+        self._changed: dict[str, Callable[[], dict[str, Any]]] = {}
+
+    async def async_load(self):
+        """Load the stored profiles."""
+        self._profiles = await self._store.async_load() or {}
+
+    async def async_remove(self):
+        """Remove the stored profiles."""
+        await self._store.async_remove()
+
+    def get(self, dev_id: str, protocol_version: str) -> dict[str, Any]:
+        """Return the profile of dev_id, if it was learned with protocol_version."""
+        profile = self._profiles.get(dev_id, {})
+        return profile if profile.get("version") == protocol_version else {}
+
+    @callback
+    def async_update(self, dev_id: str, build: Callable[[], dict[str, Any]]):
+        """Mark the profile of dev_id as changed, saved after a delay.
+
+        The profile is only built by calling build when it's saved.
+        """
+        if not self._changed:
+            self._store.async_delay_save(self._data_to_save, PROFILES_SAVE_DELAY)
+        self._changed[dev_id] = build
+
+    @callback
+    def _data_to_save(self):
+        changed, self._changed = self._changed, {}
+        for dev_id, build in changed.items():
+            self._profiles.setdefault(dev_id, {}).update(build())
+        return copy.deepcopy(self._profiles)
+
+
+class BreakerState(StrEnum):
+    """Circuit breaker states."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop reconnecting to a host that keeps failing until it shows signs of life.
+
+    Opens after BREAKER_THRESHOLD failures and goes half-open, allowing one
+    attempt, on a discovery broadcast or once BREAKER_OPEN_INTERVAL has passed.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD):
+        """Initialize the circuit breaker."""
+        self.threshold = threshold
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._wakeup = asyncio.Event()
+
+    @property
+    def is_open(self):
+        """Return whether attempts are blocked."""
+        return self.state == BreakerState.OPEN
+
+    def record_success(self):
+        """Close the breaker."""
+        self.state = BreakerState.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        """Count a failed attempt, open the breaker once the threshold is reached.
+
+        A failed half-open attempt opens it again, from the time of that failure.
+        """
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self.state = BreakerState.OPEN
+
+    def half_open(self):
+        """Allow one attempt if the breaker is open."""
+        if self.state == BreakerState.OPEN:
+            self.state = BreakerState.HALF_OPEN
+
+    def wakeup(self):
+        """Cut the current wait short, or the next one if none is in progress."""
+        self._wakeup.set()
+
+    async def wait(self, delay: float):
+        """Sleep for delay seconds, or less if woken up."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), delay)
+        except TimeoutError:
+            self.half_open()
+        finally:
+            self._wakeup.clear()
+
+
+class StartupScheduler:
+    """Connect the devices of an entry on startup, a bounded number at once.
+
+    Gateways go first, then devices by how fast they connected last time.
+    """
+
+    def __init__(self, limit=STARTUP_CONCURRENCY, jitter=STARTUP_JITTER):
+        """Initialize the scheduler."""
+        self.limit = limit
+        self.jitter = jitter
+        # Seconds since the startup began, per device ID.
+        self.timeline: dict[str, dict[str, Any]] = {}
+
+    async def async_run(self, devices: list[TuyaDevice]):
+        """Connect to devices."""
+        started = time.monotonic()
+        slots = asyncio.Semaphore(self.limit)
+
+        def elapsed():
+            return round(time.monotonic() - started, 3)
+
+        async def connect(device: TuyaDevice):
+            async with slots:
+                await asyncio.sleep(random.uniform(0, self.jitter))
+                timeline = self.timeline[device.id] = {
+                    "name": device.friendly_name,
+                    "started": elapsed(),
+                    "first_status": None,
+                }
+                await device.async_connect()
+                if device.connected:
+                    timeline["first_status"] = elapsed()
+
+        devices = sorted(devices, key=self._priority)
+        await asyncio.gather(*(connect(device) for device in devices))
+
+    @staticmethod
+    def _priority(device: TuyaDevice):
+        connect_time = device.last_connect_time
+        return (not device.sub_devices, connect_time is None, connect_time or 0)
+
+
+class UpdateBatcher:
+    """Dispatch the status updates of the devices of an entry together.
+
+    A gateway reports many sub-devices at once, their entities are updated in
+    one pass instead of interleaved with the decoding of the next messages.
+    """
+
+    def __init__(self, window=UPDATE_WINDOW):
+        """Initialize the batcher."""
+        self.window = window
+        self._pending: dict[TuyaDevice, dict[str, Any]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+
+    def add(self, device: TuyaDevice, changed: dict[str, Any]):
+        """Merge the changed DPs of device into the next pass."""
+        self._pending.setdefault(device, {}).update(changed)
+        if self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.window, self._flush)
+
+    def discard(self, device: TuyaDevice):
+        """Drop the pending updates of device."""
+        self._pending.pop(device, None)
+
+    def _flush(self):
+        self._timer = None
+        pending, self._pending = self._pending, {}
+        for device, changed in pending.items():
+            device._dispatch_status(changed)
 
 
 class HassLocalTuyaData(NamedTuple):
@@ -53,6 +253,9 @@ class HassLocalTuyaData(NamedTuple):
 
     cloud_data: TuyaCloudApi
     devices: dict[str, TuyaDevice]
+    profiles: DeviceProfiles | None = None
+    startup: StartupScheduler | None = None
+    updates: UpdateBatcher | None = None
 
 
 class TuyaDevice(TuyaListener, ContextualLogger):
@@ -76,7 +279,26 @@ class TuyaDevice(TuyaListener, ContextualLogger):
         self.local_key = self._device_config.local_key
 
         self._status = {}
+        # Entities read self._status directly, and are only woken for the DPs they use.
+        self._subscribers: dict = {}
+        self._subscriptions: dict[str, dict] = {}
+        self._dispatch_all = True
+        # DPs dispatched on their next report even if the value didn't change.
+        self._refresh_dps: set[str] = set()
         self._interface: TuyaProtocol = None
+        self._pending_events: dict[str, tuple[Any, Any]] = {}
+        self._profiles = self._hass_entry.profiles
+        self._updates = self._hass_entry.updates
+        self._profile = {}
+        self._profile_restored = False
+        self._connect_time: float | None = None
+        self._breaker = CircuitBreaker()
+        self._reconnect_attempts = 0
+        self._reconnect_backoff = 0.0
+        if self._profiles and not fake_gateway:
+            self._profile = self._profiles.get(
+                self.id, self._device_config.protocol_version
+            )
 
         # For SubDevices
         self.gateway: TuyaDevice = None
@@ -85,17 +307,29 @@ class TuyaDevice(TuyaListener, ContextualLogger):
         self._fake_gateway = fake_gateway
         self._node_id: str = self._device_config.node_id
         self._subdevice_off_count: int = 0
+        self._subdevices_status: dict[str, dict] = {}
 
         # last_update_time: Sleep timer, a device that reports the status every x seconds then goes into sleep.
         self._last_update_time = time.monotonic() - 5
         self._pending_status: dict[str, dict[str, Any]] = {}
+        self._queued_writes = 0
+        self._write_stats = {
+            "commands": 0,
+            "writes": 0,
+            "max_queue_depth": 0,
+            "last_latency_ms": 0,
+            "max_latency_ms": 0,
+        }
 
         self.is_closing = False
         self._task_connect: asyncio.Task | None = None
         self._task_reconnect: asyncio.Task | None = None
         self._task_shutdown_entities: asyncio.Task | None = None
+        # The flush collecting the DP writes, and the ones sending them.
+        self._task_write: asyncio.Task | None = None
+        self._tasks_flush: set[asyncio.Task] = set()
         self._unsub_refresh: CALLBACK_TYPE | None = None
-        self._unsub_new_entity: CALLBACK_TYPE | None = None
+        self._unsub_events: CALLBACK_TYPE | None = None
 
         self._entities = []
 
@@ -103,6 +337,7 @@ class TuyaDevice(TuyaListener, ContextualLogger):
         dev = self._device_config
         if reset_dps := dev.reset_dps:
             self._default_reset_dpids = [int(id.strip()) for id in reset_dps.split(",")]
+        self._event_dps = {dp.strip() for dp in dev.event_dps.split(",")} - {""}
 
         # This has to be done in case the device type is type_0d
         self.dps_to_request = {}
@@ -127,6 +362,16 @@ class TuyaDevice(TuyaListener, ContextualLogger):
         """Return whether device is currently connecting."""
         return self._task_connect is not None
 
+    @property
+    def last_connect_time(self) -> float | None:
+        """Seconds the last successful connect took, as known from the profile."""
+        return self._connect_time or self._profile.get("connect_time")
+
+    @property
+    def host(self) -> str:
+        """Return the IP address of the device."""
+        return self._device_config.host
+
     @property
     def is_subdevice(self):
         """Return whether this is a subdevice or not."""
@@ -150,10 +395,59 @@ class TuyaDevice(TuyaListener, ContextualLogger):
         """
         return self.is_subdevice and "0" in self._device_config.manual_dps.split(",")
 
+    @property
+    def status(self) -> dict[str, Any]:
+        """Return the status shared by the device entities."""
+        return self._status
+
+    @property
+    def status_restored(self) -> bool:
+        """Return whether the status was restored from the profile, not reported yet."""
+        return self._profile_restored
+
+    @property
+    def frame_stats(self) -> dict[str, int]:
+        """Return the frames received on the connection and how many failed checks."""
+        return self._interface.frame_stats if self._interface else {}
+
+    @property
+    def state_writes(self) -> dict[str, dict[str, int]]:
+        """Return the written and suppressed state updates of each entity."""
+        return {entity.entity_id: entity.state_writes for entity in self._entities}
+
     def add_entities(self, entities):
         """Set the entities associated with this device."""
         self._entities.extend(entities)
 
+    @callback
+    def refresh_dp(self, dp):
+        """Wake the subscribers of dp on its next report, even with the same value."""
+        self._refresh_dps.add(str(dp))
+
+    @callback
+    def subscribe(self, entity, dps) -> CALLBACK_TYPE:
+        """Wake the entity with the changed DPs when any of dps changes."""
+        dps = [str(dp) for dp in dps]
+        self._subscribers[entity] = None
+        for dp in dps:
+            self._subscriptions.setdefault(dp, {})[entity] = None
+
+        # The device is already online, the entity starts with the current status.
+        if not self._dispatch_all:
+            self.debug(f"New entity {entity.entity_id} was added")
+            self._wake_entity(entity, self._status)
+
+        @callback
+        def unsubscribe():
+            self._subscribers.pop(entity, None)
+            for dp in dps:
+                if (entities := self._subscriptions.get(dp)) is not None:
+                    entities.pop(entity, None)
+                    if not entities:
+                        self._subscriptions.pop(dp)
+
+        return unsubscribe
+
     async def async_connect(self, _now=None) -> None:
         """Connect to device if not already connected."""
         if self.is_closing or self.is_connecting:
@@ -167,24 +461,53 @@ class TuyaDevice(TuyaListener, ContextualLogger):
             await self._task_connect
 
     async def _connect_subdevices(self):
-        """Gateway: connect to sub-devices one by one."""
-        if not self.sub_devices:
+        """Gateway: query sub-devices status in one batch, then connect them."""
+        subdevices = [
+            subdevice
+            for subdevice in self.sub_devices.values()
+            if subdevice.subdevice_state != SubdeviceState.ABSENT
+            and not subdevice.connected
+        ]
+        if not subdevices or not self.connected:
             return
 
-        for subdevice in self.sub_devices.values():
-            if not self.connected or self.is_closing:
-                break
-            if subdevice.subdevice_state != SubdeviceState.ABSENT:
-                await subdevice.async_connect()
+        # Sub-devices pick their initial status from this batch instead of
+        # doing their own query once connected.
+        cids = [subdevice._node_id for subdevice in subdevices]
+        try:
+            self._subdevices_status = await self._interface.status_many(cids)
+        except Exception as ex:  # pylint: disable=broad-except
+            # Each sub-device queries its own status then.
+            self.warning(f"Failed to query the status of the sub-devices: {ex}")
+
+        slots = asyncio.Semaphore(MAX_SUBDEVICE_QUERIES)
+
+        async def connect(subdevice: TuyaDevice):
+            async with slots:
+                if self.connected and not self.is_closing:
+                    await subdevice.async_connect()
+
+        try:
+            await asyncio.gather(*(connect(subdevice) for subdevice in subdevices))
+        finally:
+            self._subdevices_status = {}
 
     async def _make_connection(self):
         """Subscribe localtuya entity events."""
         if self.is_sleep and not self._status:
             self.status_updated(RESTORE_STATES)
+        elif not self._status and (status := self._profile.get("status")):
+            # Publish the last known state while connecting.
+            self.debug("Restoring the last known status from profile")
+            self._status.update(status)
+            self._profile_restored = True
+            self._dispatch_status()
 
         name, host = self._device_config.name, self._device_config.host
+        connect_started = time.monotonic()
         retry = 0
-        max_retries = 3
+        # A single probe is enough while the breaker is not closed.
+        max_retries = 3 if self._breaker.state == BreakerState.CLOSED else 1
         update_localkey = False
 
         self.debug(f"Trying to connect to: {host}...", force=True)
@@ -216,7 +539,15 @@ class TuyaDevice(TuyaListener, ContextualLogger):
                     self._interface.enable_debug(
                         self._device_config.enable_debug, self.friendly_name
                     )
+                    self._interface.batch_writes = (
+                        self._device_config.batch_writes
+                        or self._device_config.product_key in BATCH_WRITE_PRODUCTS
+                    )
+                    self._interface.set_frame_verification(
+                        self._device_config.frame_verification
+                    )
                 self._interface.add_dps_to_request(self.dps_to_request)
+                self._apply_profile()
                 break  # Succeed break while loop
             except asyncio.CancelledError:
                 await self.abort_connect()
@@ -253,8 +584,12 @@ class TuyaDevice(TuyaListener, ContextualLogger):
                     await self._interface.reset(reset_dpids, cid=self._node_id)
 
                 self.debug("Retrieving initial state")
+                status = None
+                if self.gateway and not reset_dpids:
+                    status = self.gateway._subdevices_status.pop(self._node_id, None)
                 # Usually we use status instead of detect_available_dps, but some device doesn't reports all dps when ask for status.
-                status = await self._interface.status(cid=self._node_id)
+                if status is None:
+                    status = await self._interface.status(cid=self._node_id)
                 if status is None:
                     raise Exception("Failed to retrieve status")
 
@@ -283,22 +618,13 @@ class TuyaDevice(TuyaListener, ContextualLogger):
         # Connect and configure the entities, at this point the device should be ready to get commands.
         if self.connected and not self.is_closing:
             self.debug(f"Success: connected to: {host}", force=True)
+            self._connect_time = round(time.monotonic() - connect_started, 3)
+            self._breaker.record_success()
             # Attempt to restore status for all entities that need to first set
             # the DPS value before the device will respond with status.
             for entity in self._entities:
                 await entity.restore_state_when_connected()
 
-            if self._unsub_new_entity is None:
-
-                def _new_entity_handler(entity_id):
-                    self.debug(f"New entity {entity_id} was added to {host}")
-                    self._dispatch_status()
-
-                signal = f"localtuya_entity_{self._device_config.id}"
-                self._unsub_new_entity = async_dispatcher_connect(
-                    self.hass, signal, _new_entity_handler
-                )
-
             if (scan_inv := int(self._device_config.scan_interval)) > 0:
                 self._unsub_refresh = async_track_time_interval(
                     self.hass, self._async_refresh, timedelta(seconds=scan_inv)
@@ -325,6 +651,11 @@ class TuyaDevice(TuyaListener, ContextualLogger):
 
         # If not connected try to handle the errors.
         if not self.connected and not self.is_closing:
+            # Don't keep showing the restored status of an unreachable device.
+            if self._profile_restored and self._task_shutdown_entities is None:
+                self._task_shutdown_entities = asyncio.create_task(
+                    self._shutdown_entities(exc="Failed to connect")
+                )
             if self._task_reconnect is None:
                 self._task_reconnect = asyncio.create_task(self._async_reconnect())
             if update_localkey:
@@ -333,6 +664,44 @@ class TuyaDevice(TuyaListener, ContextualLogger):
 
         self._task_connect = None
 
+    def _apply_profile(self):
+        """Skip the detection of what is already known from the device profile."""
+        if not self._profile:
+            return
+
+        if (dev_type := self._profile.get("dev_type")) and not self._node_id:
+            self._interface.dev_type = dev_type
+        if dps := self._profile.get("dps"):
+            # A copy, the cache is updated by the device.
+            self._interface.dps_cache.setdefault(self._node_id or "parent", dict(dps))
+
+    @callback
+    def _update_profile(self):
+        """Mark the profile as changed, it's built when the profiles are saved."""
+        if not self._profiles or self._fake_gateway or not self._interface:
+            return
+
+        self._profiles.async_update(self.id, self._build_profile)
+
+    @callback
+    def _build_profile(self) -> dict[str, Any]:
+        """Return what was learned from the device for its profile."""
+        profile = {
+            "version": self._device_config.protocol_version,
+            "status": {k: v for k, v in self._status.items() if k != "0"},
+        }
+        # Kept from the stored profile if the device is disconnected.
+        if self._interface:
+            profile["dps"] = dict(
+                self._interface.dps_cache.get(self._node_id or "parent", {})
+            )
+            if not self._node_id:
+                profile["dev_type"] = self._interface.dev_type
+        if self._connect_time:
+            profile["connect_time"] = self._connect_time
+        self._profile = {**self._profile, **profile}
+        return profile
+
     async def abort_connect(self):
         """Abort the connect process to the interface[device]"""
         if self.is_subdevice:
@@ -359,7 +728,13 @@ class TuyaDevice(TuyaListener, ContextualLogger):
 
         self.is_closing = True
 
-        tasks = [self._task_shutdown_entities, self._task_reconnect, self._task_connect]
+        tasks = [
+            self._task_shutdown_entities,
+            self._task_reconnect,
+            self._task_connect,
+            self._task_write,
+            *self._tasks_flush,
+        ]
         pending_tasks = [task for task in tasks if task and task.cancel()]
         await asyncio.gather(*pending_tasks, return_exceptions=True)
 
@@ -368,14 +743,14 @@ class TuyaDevice(TuyaListener, ContextualLogger):
         for subdevice in self.sub_devices.values():
             await subdevice.close()
 
-        if self._unsub_new_entity:
-            self._unsub_new_entity()
-            self._unsub_new_entity = None
-
         if self._unsub_refresh:
             self._unsub_refresh()
             self._unsub_refresh = None
 
+        if self._unsub_events:
+            self._unsub_events()
+            self._unsub_events = None
+
         await self.abort_connect()
 
         if self.gateway:
@@ -402,8 +777,7 @@ class TuyaDevice(TuyaListener, ContextualLogger):
         """Change value of a DP of the Tuya device."""
         if self._interface is not None:
             self._pending_status.update({dp_index: state})
-            await asyncio.sleep(0.001)
-            await self.set_status()
+            await self._queue_write()
         else:
             if self.is_sleep:
                 return self._pending_status.update({str(dp_index): state})
@@ -412,12 +786,48 @@ class TuyaDevice(TuyaListener, ContextualLogger):
         """Change value of a DPs of the Tuya device."""
         if self._interface is not None:
             self._pending_status.update(states)
-            await asyncio.sleep(0.001)
-            await self.set_status()
+            await self._queue_write()
         else:
             if self.is_sleep:
                 return self._pending_status.update(states)
 
+    @property
+    def write_stats(self):
+        """Outbound command queue statistics."""
+        pacing = self._interface.pacer.stats if self._interface else {}
+        return {
+            "queue_depth": self._queued_writes,
+            **self._write_stats,
+            "pacing": pacing,
+        }
+
+    async def _queue_write(self):
+        """Wait until the pending DPs are sent, writes within the window share one command."""
+        self._queued_writes += 1
+        if self._task_write is None:
+            self._task_write = asyncio.create_task(self._flush_writes())
+            self._tasks_flush.add(self._task_write)
+            self._task_write.add_done_callback(self._tasks_flush.discard)
+        await asyncio.shield(self._task_write)
+
+    async def _flush_writes(self):
+        """Task: send the DPs queued during the command window as one command."""
+        started = time.monotonic()
+        await asyncio.sleep(self._device_config.command_window / 1000)
+        # Writes queued from now on go into the next command.
+        self._task_write = None
+        queued, self._queued_writes = self._queued_writes, 0
+
+        await self.set_status()
+
+        stats = self._write_stats
+        latency = round((time.monotonic() - started) * 1000)
+        stats["commands"] += 1
+        stats["writes"] += queued
+        stats["max_queue_depth"] = max(stats["max_queue_depth"], queued)
+        stats["last_latency_ms"] = latency
+        stats["max_latency_ms"] = max(stats["max_latency_ms"], latency)
+
     async def _async_refresh(self, _now):
         if self.connected:
             self.debug("Refreshing dps for device")
@@ -427,6 +837,42 @@ class TuyaDevice(TuyaListener, ContextualLogger):
             except TimeoutError:
                 pass
 
+    @property
+    def reconnect_stats(self):
+        """Reconnect attempts, backoff and circuit breaker state."""
+        return {
+            "attempts": self._reconnect_attempts,
+            "backoff": round(self._reconnect_backoff, 1),
+            "breaker": self._breaker.state,
+            "breaker_failures": self._breaker.failures,
+        }
+
+    @callback
+    def discovered(self, last_broadcast: float):
+        """A discovery broadcast was received, reconnect now if the device is back.
+
+        Args:
+            last_broadcast: monotonic time of the previous broadcast, 0 if none.
+        """
+        if self.connected or self.is_closing:
+            return
+
+        now = time.monotonic()
+        # Devices that keep broadcasting while failing to connect stay on backoff,
+        # an open breaker only gets one early attempt.
+        breaker = self._breaker
+        if now - last_broadcast > BROADCAST_SILENCE.total_seconds() or (
+            breaker.is_open and last_broadcast < breaker.opened_at
+        ):
+            breaker.half_open()
+            breaker.wakeup()
+
+    @callback
+    def update_host(self, host: str):
+        """Use a new IP address, from the next connect."""
+        self._device_config.host = host
+        self._device_config.device_config[CONF_HOST] = host
+
     async def _async_reconnect(self):
         """Task: continuously attempt to reconnect to the device."""
         attempts = 0
@@ -461,17 +907,27 @@ class TuyaDevice(TuyaListener, ContextualLogger):
                     break
 
                 attempts += 1
-                scale = (
-                    2
-                    if (self.subdevice_state == SubdeviceState.ABSENT)
-                    or (attempts > MIN_OFFLINE_EVENTS)
-                    else 1
-                )
-                await asyncio.sleep(scale * RECONNECT_INTERVAL.total_seconds())
+                # Sub-devices don't broadcast, their gateway is the one to wait for.
+                if not self.is_subdevice:
+                    self._breaker.record_failure()
+                if self._breaker.is_open:
+                    delay = BREAKER_OPEN_INTERVAL.total_seconds()
+                    if self._breaker.failures == self._breaker.threshold:
+                        self.info("Device looks down, waiting for it to show up")
+                else:
+                    # Exponential backoff with full jitter.
+                    ceiling = min(
+                        RECONNECT_INTERVAL.total_seconds() * 2 ** (attempts - 1),
+                        RECONNECT_MAX_INTERVAL.total_seconds(),
+                    )
+                    delay = random.uniform(0, ceiling)
+                self._reconnect_attempts, self._reconnect_backoff = attempts, delay
+                await self._breaker.wait(delay)
             except asyncio.CancelledError as e:
                 self.debug(f"Reconnect task has been canceled: {e}", force=True)
                 break
 
+        self._reconnect_attempts, self._reconnect_backoff = 0, 0.0
         self._task_reconnect = None
 
     async def _shutdown_entities(self, exc=""):
@@ -488,8 +944,7 @@ class TuyaDevice(TuyaListener, ContextualLogger):
                 self._task_shutdown_entities = None
                 return
 
-        signal = f"localtuya_{self._device_config.id}"
-        dispatcher_send(self.hass, signal, None)
+        self._dispatch_unavailable()
 
         if self.is_closing:
             return
@@ -552,32 +1007,76 @@ class TuyaDevice(TuyaListener, ContextualLogger):
             k: v for k, v in self.sub_devices.items() if not v.is_closing
         }
 
-    def _dispatch_status(self):
-        signal = f"localtuya_{self._device_config.id}"
-        dispatcher_send(self.hass, signal, self._status)
-
-    def _handle_event(self, old_status: dict, new_status: dict):
-        """Handle events in HA when devices updated."""
-
-        def fire_event(event, data: dict):
-            """Fire events."""
-            event_data = {CONF_DEVICE_ID: self.id, **data}
-            if len(event_data) > 1:
-                self.hass.bus.async_fire(f"localtuya_{event}", event_data)
-
-        event_status_update = "status_update"
-        event_device_dp_triggered = "device_dp_triggered"
-
-        if self._interface and old_status and new_status:
-            # A massive number of events that can be triggered when some devices update too quickly such as temp sensors,
-            # - We want only to update if status changed except for 1 DP trigger, for scene controls.
-            if len(self._interface.dispatched_dps) == 1:
-                dp, value = next(iter(self._interface.dispatched_dps.items()))
-                data = {"dp": dp, "value": value}
-                fire_event(event_device_dp_triggered, data)
-            if old_status != new_status:
-                data = {"old_status": old_status, "new_status": new_status}
-                fire_event(event_status_update, data)
+    def _dispatch_status(self, changed: dict | None = None):
+        """Wake the entities using the changed DPs, all of them if changed is None."""
+        if changed is None or self._dispatch_all:
+            self._dispatch_all = False
+            entities, changed = self._subscribers, self._status
+        else:
+            entities = {}
+            for dp in changed:
+                entities.update(self._subscriptions.get(dp, {}))
+
+        for entity in list(entities):
+            self._wake_entity(entity, changed)
+
+    def _dispatch_unavailable(self):
+        """Mark all the entities unavailable, the next status goes to all of them."""
+        self._dispatch_all = True
+        if self._updates:
+            self._updates.discard(self)
+        for entity in list(self._subscribers):
+            self._wake_entity(entity, None)
+
+    def _wake_entity(self, entity, changed: dict | None):
+        try:
+            entity.device_status_updated(changed)
+        except Exception as ex:  # pylint: disable=broad-except
+            self.exception(f"Failed to update {entity.entity_id}: {ex}")
+
+    def _handle_event(self, changed: dict):
+        """Handle events in HA when devices updated, only if enabled for this device."""
+        if not self._device_config.enable_events or not self._interface:
+            return
+
+        def allowed(dp):
+            return not self._event_dps or dp in self._event_dps
+
+        # The first status, or the first one after restoring the profile, isn't a change.
+        if not self._status or self._profile_restored:
+            return
+
+        # Scene controls report the same value on each trigger, so this isn't coalesced.
+        if len(self._interface.dispatched_dps) == 1:
+            dp, value = next(iter(self._interface.dispatched_dps.items()))
+            if allowed(dp):
+                self._fire_event("device_dp_triggered", {"dp": dp, "value": value})
+
+        for dp, value in changed.items():
+            if allowed(dp):
+                old_value = self._pending_events.get(dp, (self._status.get(dp),))[0]
+                self._pending_events[dp] = (old_value, value)
+
+        if self._pending_events and self._unsub_events is None:
+            self._unsub_events = async_call_later(
+                self.hass, EVENT_WINDOW, self._fire_status_update
+            )
+
+    @callback
+    def _fire_status_update(self, _now=None):
+        """Fire the DP changes of the last window in one event."""
+        self._unsub_events = None
+        events, self._pending_events = self._pending_events, {}
+        changes = {dp: (old, new) for dp, (old, new) in events.items() if old != new}
+        if changes:
+            old_status = {dp: old for dp, (old, _) in changes.items()}
+            new_status = {dp: new for dp, (_, new) in changes.items()}
+            data = {"old_status": old_status, "new_status": new_status}
+            self._fire_event("status_update", data)
+
+    def _fire_event(self, event: str, data: dict):
+        event_data = {CONF_DEVICE_ID: self.id, **data}
+        self.hass.bus.async_fire(f"localtuya_{event}", event_data)
 
     def _get_gateway(self):
         """Return the gateway device of this sub device."""
@@ -602,9 +1101,30 @@ class TuyaDevice(TuyaListener, ContextualLogger):
             return
 
         self._last_update_time = int(time.monotonic())
-        self._handle_event(self._status, status)
-        self._status.update(status)
-        self._dispatch_status()
+        # The restore placeholder is dropped once the device reports its status.
+        if status != RESTORE_STATES and self._status.get("0") == RESTORE_STATES["0"]:
+            del self._status["0"]
+
+        changed = {
+            dp: value
+            for dp, value in status.items()
+            if dp not in self._status or self._status[dp] != value
+        }
+        self._handle_event(changed)
+        self._status.update(changed)
+        if self._profile_restored:
+            # The entities become available with the first reported status.
+            self._profile_restored = False
+            self._dispatch_all = True
+
+        refreshed = {dp: status[dp] for dp in self._refresh_dps & status.keys()}
+        self._refresh_dps -= refreshed.keys()
+        dispatched = {**refreshed, **changed}
+        if not self._updates:
+            self._dispatch_status(dispatched)
+        elif dispatched or self._dispatch_all:
+            self._updates.add(self, dispatched)
+        self._update_profile()
 
     @callback
     def disconnected(self, exc=""):
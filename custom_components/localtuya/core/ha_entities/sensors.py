@@ -32,17 +32,32 @@ from .base import (
     EntityCategory,
     CLOUD_VALUE,
 )
-from ...const import CONF_SCALING as SCALE_FACTOR
+from ...const import (
+    CONF_DEADBAND,
+    CONF_DEADBAND_PERCENT,
+    CONF_PUBLISH_INTERVAL,
+    CONF_SCALING as SCALE_FACTOR,
+)
 
 
-def localtuya_sensor(unit_of_measurement=None, scale_factor: float = 1) -> dict:
+def localtuya_sensor(
+    unit_of_measurement=None, scale_factor: float = 1, **filters
+) -> dict:
     """Define LocalTuya Configs for Sensor."""
     data = {CONF_UNIT_OF_MEASUREMENT: unit_of_measurement}
     data.update({SCALE_FACTOR: CLOUD_VALUE(scale_factor, "id", "scale")})
+    data.update(filters)
 
     return data
 
 
+# Power monitoring plugs report these every few seconds.
+POWER_FILTERS = {CONF_PUBLISH_INTERVAL: 10, CONF_DEADBAND: 1, CONF_DEADBAND_PERCENT: 2}
+VOLTAGE_FILTERS = {CONF_PUBLISH_INTERVAL: 30, CONF_DEADBAND: 1}
+# Raw phase DPs are split into voltage, current and power sub-sensors.
+PHASE_FILTERS = {CONF_PUBLISH_INTERVAL: 10}
+
+
 # Commonly used battery sensors, that are reused in the sensors down below.
 BATTERY_SENSORS: dict[str, tuple[LocalTuyaEntity, ...]] = (
     LocalTuyaEntity(
@@ -385,14 +400,16 @@ SENSORS: dict[str, tuple[LocalTuyaEntity, ...]] = {
             name="Power",
             device_class=SensorDeviceClass.POWER,
             state_class=SensorStateClass.MEASUREMENT,
-            custom_configs=localtuya_sensor(UnitOfPower.WATT, 0.1),
+            custom_configs=localtuya_sensor(UnitOfPower.WATT, 0.1, **POWER_FILTERS),
         ),
         LocalTuyaEntity(
             id=DPCode.CUR_VOLTAGE,
             name="Voltage",
             device_class=SensorDeviceClass.VOLTAGE,
             state_class=SensorStateClass.MEASUREMENT,
-            custom_configs=localtuya_sensor(UnitOfElectricPotential.VOLT, 0.1),
+            custom_configs=localtuya_sensor(
+                UnitOfElectricPotential.VOLT, 0.1, **VOLTAGE_FILTERS
+            ),
         ),
         LocalTuyaEntity(
             id=DPCode.ADD_ELE,
@@ -421,28 +438,32 @@ SENSORS: dict[str, tuple[LocalTuyaEntity, ...]] = {
             name="Power 1",
             device_class=SensorDeviceClass.POWER,
             state_class=SensorStateClass.MEASUREMENT,
-            custom_configs=localtuya_sensor(UnitOfPower.WATT, 0.1),
+            custom_configs=localtuya_sensor(UnitOfPower.WATT, 0.1, **POWER_FILTERS),
         ),
         LocalTuyaEntity(
             id=DPCode.CUR_POWER2,
             name="Power 2",
             device_class=SensorDeviceClass.POWER,
             state_class=SensorStateClass.MEASUREMENT,
-            custom_configs=localtuya_sensor(UnitOfPower.WATT, 0.1),
+            custom_configs=localtuya_sensor(UnitOfPower.WATT, 0.1, **POWER_FILTERS),
         ),
         LocalTuyaEntity(
             id=DPCode.CUR_VOLTAGE1,
             name="Voltage 1",
             device_class=SensorDeviceClass.VOLTAGE,
             state_class=SensorStateClass.MEASUREMENT,
-            custom_configs=localtuya_sensor(UnitOfElectricPotential.VOLT, 0.1),
+            custom_configs=localtuya_sensor(
+                UnitOfElectricPotential.VOLT, 0.1, **VOLTAGE_FILTERS
+            ),
         ),
         LocalTuyaEntity(
             id=DPCode.CUR_VOLTAGE2,
             name="Voltage 2",
             device_class=SensorDeviceClass.VOLTAGE,
             state_class=SensorStateClass.MEASUREMENT,
-            custom_configs=localtuya_sensor(UnitOfElectricPotential.VOLT, 0.1),
+            custom_configs=localtuya_sensor(
+                UnitOfElectricPotential.VOLT, 0.1, **VOLTAGE_FILTERS
+            ),
         ),
         LocalTuyaEntity(
             id=DPCode.ADD_ELE1,
@@ -558,7 +579,7 @@ SENSORS: dict[str, tuple[LocalTuyaEntity, ...]] = {
             name="Power",
             device_class=SensorDeviceClass.POWER,
             state_class=SensorStateClass.MEASUREMENT,
-            custom_configs=localtuya_sensor(UnitOfPower.WATT, 0.1),
+            custom_configs=localtuya_sensor(UnitOfPower.WATT, 0.1, **POWER_FILTERS),
             # entity_registry_enabled_default=False,
         ),
         LocalTuyaEntity(
@@ -566,7 +587,9 @@ SENSORS: dict[str, tuple[LocalTuyaEntity, ...]] = {
             name="Voltage",
             device_class=SensorDeviceClass.VOLTAGE,
             state_class=SensorStateClass.MEASUREMENT,
-            custom_configs=localtuya_sensor(UnitOfElectricPotential.VOLT, 0.1),
+            custom_configs=localtuya_sensor(
+                UnitOfElectricPotential.VOLT, 0.1, **VOLTAGE_FILTERS
+            ),
             # entity_registry_enabled_default=False,
         ),
         LocalTuyaEntity(
@@ -1046,16 +1069,19 @@ SENSORS: dict[str, tuple[LocalTuyaEntity, ...]] = {
             id=DPCode.PHASE_A,
             name="Phase C Current",
             entity_category=EntityCategory.DIAGNOSTIC,
+            custom_configs=PHASE_FILTERS,
         ),
         LocalTuyaEntity(
             id=DPCode.PHASE_B,
             name="Phase B",
             entity_category=EntityCategory.DIAGNOSTIC,
+            custom_configs=PHASE_FILTERS,
         ),
         LocalTuyaEntity(
             id=DPCode.PHASE_C,
             name="Phase C",
             entity_category=EntityCategory.DIAGNOSTIC,
+            custom_configs=PHASE_FILTERS,
         ),
         ## PHASE X Are probably encrypted values. since it duplicated it probably raw dict data.
         LocalTuyaEntity(
@@ -1381,7 +1407,7 @@ SENSORS: dict[str, tuple[LocalTuyaEntity, ...]] = {
             device_class=SensorDeviceClass.POWER,
             state_class=SensorStateClass.MEASUREMENT,
             entity_category=EntityCategory.DIAGNOSTIC,
-            custom_configs=localtuya_sensor(UnitOfPower.WATT, 0.1),
+            custom_configs=localtuya_sensor(UnitOfPower.WATT, 0.1, **POWER_FILTERS),
             # entity_registry_enabled_default=False,
         ),
         LocalTuyaEntity(
@@ -1390,7 +1416,9 @@ SENSORS: dict[str, tuple[LocalTuyaEntity, ...]] = {
             device_class=SensorDeviceClass.VOLTAGE,
             state_class=SensorStateClass.MEASUREMENT,
             entity_category=EntityCategory.DIAGNOSTIC,
-            custom_configs=localtuya_sensor(UnitOfElectricPotential.VOLT, 0.1),
+            custom_configs=localtuya_sensor(
+                UnitOfElectricPotential.VOLT, 0.1, **VOLTAGE_FILTERS
+            ),
             # entity_registry_enabled_default=False,
         ),
         LocalTuyaEntity(
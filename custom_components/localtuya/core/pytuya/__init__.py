@@ -38,22 +38,59 @@ Credits
 import os
 import asyncio
 import errno
-import base64
 import binascii
-import hmac
 import json
 import logging
-import struct
 import time
 import weakref
-from enum import Enum
+from collections import deque
+from enum import Enum, StrEnum
+from functools import partial
 from abc import ABC, abstractmethod
 from typing import Self
-from collections import namedtuple
-from hashlib import md5, sha256
-
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from hashlib import md5
+
+from .codec import (
+    IV_LEN,
+    MESSAGE_END_FMT,
+    MESSAGE_END_FMT_55AA,
+    MESSAGE_END_FMT_6699,
+    MESSAGE_END_FMT_HMAC,
+    MESSAGE_HEADER_FMT,
+    MESSAGE_HEADER_FMT_55AA,
+    MESSAGE_HEADER_FMT_6699,
+    MESSAGE_RECV_HEADER_FMT,
+    MESSAGE_RETCODE_FMT,
+    PREFIX_6699_BIN,
+    PREFIX_6699_VALUE,
+    PREFIX_55AA_BIN,
+    PREFIX_55AA_VALUE,
+    PREFIX_BIN,
+    PREFIX_VALUE,
+    STRUCT_END_55AA,
+    STRUCT_END_6699,
+    STRUCT_END_HMAC,
+    STRUCT_HEADER_55AA,
+    STRUCT_HEADER_6699,
+    STRUCT_RECV_HEADER,
+    STRUCT_RETCODE,
+    SUFFIX_6699_BIN,
+    SUFFIX_6699_VALUE,
+    SUFFIX_55AA_BIN,
+    SUFFIX_55AA_VALUE,
+    SUFFIX_BIN,
+    SUFFIX_VALUE,
+    AESCipher,
+    DecodeError,
+    FrameDecoder,
+    MessagePayload,
+    TuyaHeader,
+    TuyaMessage,
+    pack_message,
+    parse_header,
+    read_header,
+    unpack_message,
+)
 
 version_tuple = (2024, 6, 0)
 version = version_string = __version__ = "%d.%d.%d" % version_tuple
@@ -61,20 +98,6 @@ __author__ = "rospogrigio, xZetsubou"
 
 _LOGGER = logging.getLogger(__name__)
 
-# Tuya Packet Format
-TuyaHeader = namedtuple("TuyaHeader", "prefix seqno cmd length total_length")
-MessagePayload = namedtuple("MessagePayload", "cmd payload")
-try:
-    TuyaMessage = namedtuple(
-        "TuyaMessage",
-        "seqno cmd retcode payload crc crc_good prefix iv",
-        defaults=(True, 0x55AA, None),
-    )
-except:
-    TuyaMessage = namedtuple(
-        "TuyaMessage", "seqno cmd retcode payload crc crc_good prefix iv"
-    )
-
 # TinyTuya Error Response Codes
 ERR_JSON = 900
 ERR_CONNECT = 901
@@ -110,18 +133,20 @@ error_codes = {
 }
 
 
-class DecodeError(Exception):
-    """Specific Exception caused by decoding error."""
-
-    pass
-
-
 class SubdeviceState(Enum):
     ONLINE = 1
     OFFLINE = 2
     ABSENT = 3
 
 
+class FrameVerification(StrEnum):
+    """What to do with received frames that fail the CRC, HMAC or GCM tag check."""
+
+    STRICT = "strict"  # Drop them.
+    WARN = "warn"  # Dispatch them anyway.
+    OFF = "off"  # Skip the 55AA CRC and HMAC checks, for trusted networks.
+
+
 # Tuya Command Types
 # Reference:
 # https://github.com/tuya/tuya-iotos-embeded-sdk-wifi-ble-bk7231n/blob/master/sdk/include/lan_protocol.h
@@ -159,23 +184,6 @@ PROTOCOL_3x_HEADER = 12 * b"\x00"
 PROTOCOL_33_HEADER = PROTOCOL_VERSION_BYTES_33 + PROTOCOL_3x_HEADER
 PROTOCOL_34_HEADER = PROTOCOL_VERSION_BYTES_34 + PROTOCOL_3x_HEADER
 PROTOCOL_35_HEADER = PROTOCOL_VERSION_BYTES_35 + PROTOCOL_3x_HEADER
-MESSAGE_RECV_HEADER_FMT = ">5I"  # 4*uint32: prefix, seqno, cmd, length, retcode
-MESSAGE_HEADER_FMT = MESSAGE_HEADER_FMT_55AA = (
-    ">4I"  # 4*uint32: prefix, seqno, cmd, length [, retcode]
-)
-MESSAGE_HEADER_FMT_6699 = ">IHIII"  # 4*uint32: prefix, unknown, seqno, cmd, length
-MESSAGE_RETCODE_FMT = ">I"  # retcode for received messages
-MESSAGE_END_FMT = MESSAGE_END_FMT_55AA = ">2I"  # 2*uint32: crc, suffix
-MESSAGE_END_FMT_HMAC = ">32sI"  # 32s:hmac, uint32:suffix
-MESSAGE_END_FMT_6699 = ">16sI"  # 16s:tag, suffix
-PREFIX_VALUE = PREFIX_55AA_VALUE = 0x000055AA
-PREFIX_BIN = PREFIX_55AA_BIN = b"\x00\x00U\xaa"
-SUFFIX_VALUE = SUFFIX_55AA_VALUE = 0x0000AA55
-SUFFIX_BIN = SUFFIX_55AA_BIN = b"\x00\x00\xaaU"
-PREFIX_6699_VALUE = 0x00006699
-PREFIX_6699_BIN = b"\x00\x00\x66\x99"
-SUFFIX_6699_VALUE = 0x00009966
-SUFFIX_6699_BIN = b"\x00\x00\x99\x66"
 
 NO_PROTOCOL_HEADER_CMDS = [
     DP_QUERY,
@@ -191,6 +199,18 @@ NO_PROTOCOL_HEADER_CMDS = [
 HEARTBEAT_INTERVAL = 8.3
 TIMEOUT_CONNECT = 5
 TIMEOUT_REPLY = 5
+MIN_COMMAND_INTERVAL = 0.050  # Minimum gap between two frames sent to a device.
+COMMAND_BURST = 1  # Writes a device accepts at once after being idle.
+MAX_SUBDEVICE_QUERIES = 8  # Sub-device exchanges in flight at once on a gateway.
+
+# DP detection of type_0d devices, which only report the DPs they are queried for.
+# Queries are limited in length, the DPs are requested DPS_PER_QUERY at a time.
+DPS_PER_QUERY = 10
+# DPs are usually within these ranges, a range with DPs is extended by the next
+# DPS_PER_QUERY DPs up to MAX_DP. Devices with DPs above 100 may use DPs from 150.
+DP_RANGES = ((2, 11), (11, 21), (21, 31), (100, 111))
+DP_HIGH_RANGE = (150, 161)
+MAX_DP = 255
 
 # DPS that are known to be safe to use with update_dps (0x12) command
 UPDATE_DPS_WHITELIST = [18, 19, 20]  # Socket (Wi-Fi)
@@ -253,6 +273,43 @@ payload_dict = {
         DP_QUERY: {"command_override": DP_QUERY_NEW},
     },
 }
+DEFAULT_PAYLOAD = {"gwId": "", "devId": "", "uid": "", "t": "", "cid": ""}
+
+
+def _build_payload_template(dev_type, command) -> tuple[int, dict]:
+    """Return the (command_override, json template) of a command for dev_type."""
+    json_data = command_override = None
+    for payloads in (payload_dict[dev_type], payload_dict["type_0a"]):
+        if command in payloads:
+            if json_data is None and "command" in payloads[command]:
+                json_data = payloads[command]["command"]
+            if command_override is None and "command_override" in payloads[command]:
+                command_override = payloads[command]["command_override"]
+
+    if command_override is None:
+        command_override = command
+    if json_data is None:
+        # I have yet to see a device complain about included but unneeded attribs, but they *will*
+        # complain about missing attribs, so just include them all unless otherwise specified
+        json_data = DEFAULT_PAYLOAD
+    return command_override, json_data
+
+
+# Templates are resolved once per (dev_type, command), _generate_payload only copies them.
+payload_templates = {
+    (dev_type, command): _build_payload_template(dev_type, command)
+    for dev_type in payload_dict
+    for command in {cmd for payloads in payload_dict.values() for cmd in payloads}
+}
+
+
+def get_payload_template(dev_type, command) -> tuple[int, dict]:
+    """Return the cached (command_override, json template) of a command."""
+    if (template := payload_templates.get((dev_type, command))) is None:
+        template = payload_templates[(dev_type, command)] = _build_payload_template(
+            dev_type, command
+        )
+    return template
 
 
 class TuyaLoggingAdapter(logging.LoggerAdapter):
@@ -317,268 +374,6 @@ class ContextualLogger:
         return self._logger.exception(msg, *args)
 
 
-def pack_message(msg, hmac_key=None):
-    """Pack a TuyaMessage into bytes."""
-    if msg.prefix == PREFIX_55AA_VALUE:
-        header_fmt = MESSAGE_HEADER_FMT_55AA
-        end_fmt = MESSAGE_END_FMT_HMAC if hmac_key else MESSAGE_END_FMT_55AA
-        msg_len = len(msg.payload) + struct.calcsize(end_fmt)
-        header_data = (msg.prefix, msg.seqno, msg.cmd, msg_len)
-    elif msg.prefix == PREFIX_6699_VALUE:
-        if not hmac_key:
-            raise TypeError("key must be provided to pack 6699-format messages")
-        header_fmt = MESSAGE_HEADER_FMT_6699
-        end_fmt = MESSAGE_END_FMT_6699
-        msg_len = len(msg.payload) + (struct.calcsize(end_fmt) - 4) + 12
-        if type(msg.retcode) == int:
-            msg_len += struct.calcsize(MESSAGE_RETCODE_FMT)
-        header_data = (msg.prefix, 0, msg.seqno, msg.cmd, msg_len)
-    else:
-        raise ValueError(
-            "pack_message() cannot handle message format %08X" % msg.prefix
-        )
-
-    # Create full message excluding CRC and suffix
-    data = struct.pack(header_fmt, *header_data)
-
-    if msg.prefix == PREFIX_6699_VALUE:
-        cipher = AESCipher(hmac_key)
-        if type(msg.retcode) == int:
-            raw = struct.pack(MESSAGE_RETCODE_FMT, msg.retcode) + msg.payload
-        else:
-            raw = msg.payload
-        data2 = cipher.encrypt(
-            raw,
-            use_base64=False,
-            pad=False,
-            iv=True if not msg.iv else msg.iv,
-            header=data[4:],
-        )
-        data += data2 + SUFFIX_6699_BIN
-    else:
-        data += msg.payload
-        if hmac_key:
-            crc = hmac.new(hmac_key, data, sha256).digest()
-        else:
-            crc = binascii.crc32(data) & 0xFFFFFFFF
-        # Calculate CRC, add it together with suffix
-        data += struct.pack(end_fmt, crc, SUFFIX_VALUE)
-
-    return data
-
-
-def unpack_message(data, hmac_key=None, header=None, no_retcode=False, logger=_LOGGER):
-    """Unpack bytes into a TuyaMessage."""
-    if header is None:
-        header = parse_header(data)
-
-    if header.prefix == PREFIX_55AA_VALUE:
-        # 4-word header plus return code
-        header_len = struct.calcsize(MESSAGE_HEADER_FMT_55AA)
-        end_fmt = MESSAGE_END_FMT_HMAC if hmac_key else MESSAGE_END_FMT_55AA
-        retcode_len = 0 if no_retcode else struct.calcsize(MESSAGE_RETCODE_FMT)
-        msg_len = header_len + header.length
-    elif header.prefix == PREFIX_6699_VALUE:
-        if not hmac_key:
-            raise TypeError("key must be provided to unpack 6699-format messages")
-        header_len = struct.calcsize(MESSAGE_HEADER_FMT_6699)
-        end_fmt = MESSAGE_END_FMT_6699
-        retcode_len = 0
-        msg_len = header_len + header.length + 4
-    else:
-        raise ValueError(
-            "unpack_message() cannot handle message format %08X" % header.prefix
-        )
-
-    if len(data) < msg_len:
-        logger.debug(
-            "unpack_message(): not enough data to unpack payload! need %d but only have %d",
-            header_len + header.length,
-            len(data),
-        )
-        raise DecodeError(f"Not enough data to unpack payload: {data}")
-
-    end_len = struct.calcsize(end_fmt)
-    # the retcode is technically part of the payload, but strip it as we do not want it here
-    retcode = (
-        0
-        if not retcode_len
-        else struct.unpack(
-            MESSAGE_RETCODE_FMT, data[header_len : header_len + retcode_len]
-        )[0]
-    )
-    payload = data[header_len + retcode_len : msg_len]
-    crc, suffix = struct.unpack(end_fmt, payload[-end_len:])
-    payload = payload[:-end_len]
-
-    if header.prefix == PREFIX_55AA_VALUE:
-        if hmac_key:
-            have_crc = hmac.new(
-                hmac_key, data[: (header_len + header.length) - end_len], sha256
-            ).digest()
-        else:
-            have_crc = (
-                binascii.crc32(data[: (header_len + header.length) - end_len])
-                & 0xFFFFFFFF
-            )
-
-        if suffix != SUFFIX_VALUE:
-            logger.debug("Suffix prefix wrong! %08X != %08X", suffix, SUFFIX_VALUE)
-
-        if crc != have_crc:
-            if hmac_key:
-                logger.debug(
-                    "HMAC checksum wrong! %r != %r",
-                    binascii.hexlify(have_crc),
-                    binascii.hexlify(crc),
-                )
-            else:
-                logger.debug("CRC wrong! %08X != %08X", have_crc, crc)
-        crc_good = crc == have_crc
-        iv = None
-    elif header.prefix == PREFIX_6699_VALUE:
-        iv = payload[:12]
-        payload = payload[12:]
-        try:
-            cipher = AESCipher(hmac_key)
-            payload = cipher.decrypt(
-                payload,
-                use_base64=False,
-                decode_text=False,
-                iv=iv,
-                header=data[4:header_len],
-                tag=crc,
-            )
-            crc_good = True
-        except:
-            crc_good = False
-
-        retcode_len = struct.calcsize(MESSAGE_RETCODE_FMT)
-        if no_retcode is False:
-            pass
-        elif (
-            no_retcode is None
-            and payload[0:1] != b"{"
-            and payload[retcode_len : retcode_len + 1] == b"{"
-        ):
-            retcode_len = struct.calcsize(MESSAGE_RETCODE_FMT)
-        else:
-            retcode_len = 0
-        if retcode_len:
-            retcode = struct.unpack(MESSAGE_RETCODE_FMT, payload[:retcode_len])[0]
-            payload = payload[retcode_len:]
-
-    return TuyaMessage(
-        header.seqno, header.cmd, retcode, payload, crc, crc_good, header.prefix, iv
-    )
-
-
-def parse_header(data, logger=_LOGGER):
-    """Unpack bytes into a TuyaHeader."""
-    if data[:4] == PREFIX_6699_BIN:
-        fmt = MESSAGE_HEADER_FMT_6699
-    else:
-        fmt = MESSAGE_HEADER_FMT_55AA
-
-    header_len = struct.calcsize(fmt)
-
-    if len(data) < header_len:
-        err = "Not enough data to unpack header"
-        logger.error(err)
-        raise DecodeError(err)
-
-    unpacked = struct.unpack(fmt, data[:header_len])
-    prefix = unpacked[0]
-
-    if prefix == PREFIX_55AA_VALUE:
-        prefix, seqno, cmd, payload_len = unpacked
-        total_length = payload_len + header_len
-    elif prefix == PREFIX_6699_VALUE:
-        prefix, unknown, seqno, cmd, payload_len = unpacked
-        # seqno |= unknown << 32
-        total_length = payload_len + header_len + len(SUFFIX_6699_BIN)
-    else:
-        err = f"Header prefix wrong! {prefix} is not {PREFIX_55AA_VALUE} or {PREFIX_6699_VALUE}"
-        logger.error(err)
-        raise DecodeError(err)
-
-    # sanity check. currently the max payload length is somewhere around 300 bytes
-    if payload_len > 2000:
-        err = f"Header claims the packet size is over 2000 bytes!  It is most likely corrupt. Claimed size: {payload_len} bytes. fmt: {fmt} unpacked: {unpacked}"
-        logger.error(err)
-        raise DecodeError(err)
-
-    return TuyaHeader(prefix, seqno, cmd, payload_len, total_length)
-
-
-class AESCipher:
-    """Cipher module for Tuya communication."""
-
-    def __init__(self, key):
-        """Initialize a new AESCipher."""
-        self.block_size = 16
-        self.key = key
-        self.cipher = Cipher(algorithms.AES(key), modes.ECB(), default_backend())
-
-    def encrypt(self, raw, use_base64=True, pad=True, iv=False, header=None):
-        """Encrypt data to be sent to device."""
-        if iv:
-            if iv is True:
-                if _LOGGER.isEnabledFor(logging.DEBUG):
-                    iv = b"0123456789ab"
-                else:
-                    iv = str(time.time() * 10)[:12].encode("utf8")
-            encryptor = Cipher(algorithms.AES(self.key), modes.GCM(iv)).encryptor()
-            if header:
-                encryptor.authenticate_additional_data(header)
-            crypted_text = encryptor.update(raw) + encryptor.finalize()
-            crypted_text = iv + crypted_text + encryptor.tag
-        else:
-            encryptor = self.cipher.encryptor()
-            if pad:
-                raw = self._pad(raw)
-            crypted_text = encryptor.update(raw) + encryptor.finalize()
-        return base64.b64encode(crypted_text) if use_base64 else crypted_text
-
-    def decrypt(
-        self, enc, use_base64=True, decode_text=True, iv=False, header=None, tag=None
-    ):
-        """Decrypt data from device."""
-        if not iv:
-            if use_base64:
-                enc = base64.b64decode(enc)
-
-        if iv:
-            if iv is True:
-                iv = enc[:12]
-                enc = enc[12:]
-            if tag is None:
-                decryptor = Cipher(
-                    algorithms.AES(self.key), modes.CTR(iv + b"\x00\x00\x00\x02")
-                ).decryptor()
-            else:
-                decryptor = Cipher(
-                    algorithms.AES(self.key), modes.GCM(iv, tag)
-                ).decryptor()
-            if header and (tag is not None):
-                decryptor.authenticate_additional_data(header)
-            raw = decryptor.update(enc) + decryptor.finalize()
-        else:
-            decryptor = self.cipher.decryptor()
-            raw = decryptor.update(enc) + decryptor.finalize()
-            raw = self._unpad(raw)
-
-        return raw.decode("utf-8") if decode_text else raw
-
-    def _pad(self, data):
-        padnum = self.block_size - len(data) % self.block_size
-        return data + padnum * chr(padnum).encode()
-
-    @staticmethod
-    def _unpad(data):
-        return data[: -ord(data[len(data) - 1 :])]
-
-
 class MessageDispatcher(ContextualLogger):
     """Buffer and dispatcher for Tuya messages."""
 
@@ -593,84 +388,100 @@ class MessageDispatcher(ContextualLogger):
     def __init__(self, dev_id, callback_status_update, protocol_version, local_key):
         """Initialize a new MessageBuffer."""
         super().__init__()
-        self.buffer = b""
-        self.listeners: dict[str, asyncio.Semaphore] = {}
+        self.decoder = FrameDecoder(self)
+        self.listeners: dict[int, list[asyncio.Future]] = {}
         self.callback_status_update = callback_status_update
         self.version = protocol_version
         self.local_key = local_key
+        self.cipher: AESCipher | None = None
+        self.verification = FrameVerification.WARN
+        self.frame_stats = {"received": 0, "failed": 0, "dropped": 0}
 
     def abort(self):
         """Abort all waiting clients."""
-        for key in self.listeners:
-            sem = self.listeners[key]
-            self.listeners[key] = None
+        listeners, self.listeners = self.listeners, {}
+        for waiters in listeners.values():
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
 
-            # TODO: Received data and semahore should be stored separately
-            if isinstance(sem, asyncio.Semaphore):
-                sem.release()
+    def create_waiter(self, seqno) -> asyncio.Future:
+        """Register a waiter for the response to seqno, before the request is sent.
 
-    async def wait_for(self, seqno, cmd, timeout=TIMEOUT_REPLY):
+        The waiter has no timeout until start_timeout is called, once the request
+        is written, so time spent queued for writing doesn't count against it.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        self.listeners.setdefault(seqno, []).append(waiter)
+        waiter.add_done_callback(partial(self._remove_waiter, seqno))
+        return waiter
+
+    def start_timeout(self, waiter: asyncio.Future, seqno, cmd, timeout=TIMEOUT_REPLY):
+        """Fail waiter with a TimeoutError if no response arrives within timeout."""
+        if waiter.done():
+            return
+        loop = asyncio.get_running_loop()
+        timer = loop.call_later(timeout, self._waiter_timeout, waiter, seqno, cmd)
+        waiter.add_done_callback(lambda _: timer.cancel())
+
+    async def wait_for(self, seqno, cmd, timeout=TIMEOUT_REPLY, waiter=None):
         """Wait for response to a sequence number to be received and return it."""
-        if seqno in self.listeners:
-            self.debug(f"listener exists for {seqno}")
-            if seqno == self.HEARTBEAT_SEQNO:
-                raise Exception(f"listener exists for {seqno}")
+        if waiter is None:
+            waiter = self.create_waiter(seqno)
+        self.start_timeout(waiter, seqno, cmd, timeout)
 
         self.debug("Command %d waiting for seq. number %d", cmd, seqno)
-        self.listeners[seqno] = asyncio.Semaphore(0)
-        try:
-            await asyncio.wait_for(self.listeners[seqno].acquire(), timeout=timeout)
-        except asyncio.TimeoutError:
-            self.debug(
-                "Command %d timed out waiting for sequence number %d", cmd, seqno
-            )
-            del self.listeners[seqno]
-            raise TimeoutError(
-                f"Command {cmd} timed out waiting for sequence number {seqno}"
-            )
-        return self.listeners.pop(seqno)
+        return await waiter
+
+    def _waiter_timeout(self, waiter: asyncio.Future, seqno, cmd):
+        if waiter.done():
+            return
+
+        self.debug("Command %d timed out waiting for sequence number %d", cmd, seqno)
+        waiter.set_exception(
+            TimeoutError(f"Command {cmd} timed out waiting for sequence number {seqno}")
+        )
+
+    def _remove_waiter(self, seqno, waiter):
+        """Drop a finished, timed out or cancelled waiter."""
+        if (waiters := self.listeners.get(seqno)) and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self.listeners[seqno]
 
     def add_data(self, data):
         """Add new data to the buffer and try to parse messages."""
-        self.buffer += data
-
-        header_len = struct.calcsize(MESSAGE_RECV_HEADER_FMT)
-        while self.buffer:
-            # Check if enough data for measage header
-            if len(self.buffer) < header_len:
-                break
-
-            prefix_offset_55AA = self.buffer.find(PREFIX_55AA_BIN)
-            prefix_offset_6699 = self.buffer.find(PREFIX_6699_BIN)
-            prefixes = (prefix_offset_55AA, prefix_offset_6699)
-
-            # If somehow we got unexpected message, we will ignore it and reset the buffer.
-            if prefix_offset_55AA < 0 and prefix_offset_6699 < 0:
-                self.debug(f"Got unexpected Message prefix: {self.buffer}", force=True)
-                self.buffer = b""
-                break
-
-            # If the prefix is not at the start of the message.
-            if prefix_offset_55AA != 0 and prefix_offset_6699 != 0:
-                self.debug(f"Message prefix offset not at the start {self.buffer}")
-                prefix_offset = min(prefix for prefix in prefixes if not prefix < 0)
-                self.buffer = self.buffer[prefix_offset:]
-
-            header = parse_header(self.buffer, logger=self)
-            # Check if the all data for the message has been received.
-            if len(self.buffer) < header.total_length:
-                break
-
-            hmac_key = self.local_key if self.version >= 3.4 else None
-            no_retcode = False
-            msg = unpack_message(
-                self.buffer,
-                header=header,
-                hmac_key=hmac_key,
-                no_retcode=no_retcode,
-                logger=self,
-            )
-            self.buffer = self.buffer[header.total_length :]
+        hmac_key = None
+        if self.version >= 3.4:
+            if self.cipher is None:
+                self.cipher = AESCipher(self.local_key)
+            hmac_key = self.cipher
+        verification = self.verification
+        stats = self.frame_stats
+        for header, frame in self.decoder.feed(data):
+            stats["received"] += 1
+            try:
+                msg = unpack_message(
+                    frame,
+                    header=header,
+                    hmac_key=hmac_key,
+                    no_retcode=False,
+                    logger=self,
+                    verify=verification != FrameVerification.OFF,
+                )
+            except (DecodeError, ValueError) as ex:
+                # The frames after it in the same data are still dispatched.
+                stats["failed"] += 1
+                stats["dropped"] += 1
+                self.warning("Dropped a frame that failed to decode: %s", ex)
+                continue
+            if not msg.crc_good:
+                stats["failed"] += 1
+                if verification == FrameVerification.STRICT:
+                    stats["dropped"] += 1
+                    self.warning("Dropped a frame that failed verification: %s", msg)
+                    continue
+                self.warning("Received a frame that failed verification: %s", msg)
             self._dispatch(msg)
 
     def _dispatch(self, msg):
@@ -718,15 +529,81 @@ class MessageDispatcher(ContextualLogger):
                 )
 
     def _release_listener(self, seqno, msg):
-        if seqno not in self.listeners:
+        """Resolve every client waiting for seqno with msg."""
+        if not (waiters := self.listeners.pop(seqno, None)):
             return
 
-        sem = self.listeners[seqno]
-        if isinstance(sem, asyncio.Semaphore):
-            self.listeners[seqno] = msg
-            sem.release()
-        else:
-            self.debug(f"{seqno} - Got additional message without request: skip {sem}")
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(msg)
+
+
+class WritePacer:
+    """Token bucket pacing the writes to a device.
+
+    Up to burst writes go out at once, then one every interval. Waiting writes
+    are released at their exact time by a single call_at() timer. A pacer can
+    be shared by the connections that must be paced together.
+    """
+
+    def __init__(self, interval=MIN_COMMAND_INTERVAL, burst=COMMAND_BURST):
+        """Initialize a new WritePacer."""
+        self.interval = interval
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = 0.0
+        self._waiters: deque[tuple[asyncio.Future, float]] = deque()
+        self._timer: asyncio.TimerHandle | None = None
+        self.stats = {"writes": 0, "delayed": 0, "last_wait_ms": 0, "max_wait_ms": 0}
+
+    def _refill(self, now):
+        if self._updated:
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed / self.interval)
+        self._updated = now
+
+    def _take(self, queued_at, now):
+        """Spend a token on a write that waited since queued_at."""
+        self._tokens -= 1
+        wait_ms = round((now - queued_at) * 1000)
+        stats = self.stats
+        stats["writes"] += 1
+        stats["last_wait_ms"] = wait_ms
+        stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+
+    async def wait(self):
+        """Wait until the next write can go out."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self._refill(now)
+        if self._tokens >= 1 and not self._waiters:
+            return self._take(now, now)
+
+        waiter = loop.create_future()
+        self._waiters.append((waiter, now))
+        self.stats["delayed"] += 1
+        self._schedule(loop)
+        await waiter
+
+    def _schedule(self, loop: asyncio.AbstractEventLoop):
+        if self._timer is None:
+            release_at = self._updated + (1 - self._tokens) * self.interval
+            self._timer = loop.call_at(release_at, self._release, loop, release_at)
+
+    def _release(self, loop: asyncio.AbstractEventLoop, release_at):
+        """Timer: wake up the writes that have a token by now."""
+        self._timer = None
+        # Timers may run slightly early, within the loop clock resolution.
+        now = max(loop.time(), release_at)
+        self._refill(now)
+        waiters = self._waiters
+        while waiters and self._tokens >= 1:
+            waiter, queued_at = waiters.popleft()
+            if not waiter.done():
+                self._take(queued_at, now)
+                waiter.set_result(None)
+        if waiters:
+            self._schedule(loop)
 
 
 class TuyaListener(ABC):
@@ -797,7 +674,8 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
             # them (such as BulbDevice) make connections when called
             TuyaProtocol.set_version(self, 3.1)
 
-        self.cipher = AESCipher(self.local_key)
+        self._cipher: AESCipher | None = None
+        self._real_cipher: AESCipher | None = None
         self.seqno = 1
         self.transport = None
         self.listener = weakref.ref(listener)
@@ -811,7 +689,11 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
         self.dps_whitelist = UPDATE_DPS_WHITELIST
         self.dispatched_dps = {}  # Store payload so we can trigger an event in HA.
         self._last_command_sent = 1  # The time last command was sent
+        self.pacer = WritePacer()
         self._write_lock = asyncio.Lock()  # To serialize writes
+        # Whether the device accepts several frames in one write.
+        self.batch_writes = False
+        self._session_key_lock = asyncio.Lock()  # One key negotiation at a time
         self.enable_debug(enable_debug)
 
     def set_version(self, protocol_version):
@@ -827,6 +709,29 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
         elif protocol_version == 3.5:
             self.dev_type = "v3.5"
 
+    @property
+    def cipher(self) -> AESCipher:
+        """Return the crypto context of the current session key."""
+        if self._cipher is None:
+            self._cipher = self.dispatcher.cipher = AESCipher(self.local_key)
+        return self._cipher
+
+    @property
+    def real_cipher(self) -> AESCipher:
+        """Return the crypto context of the device local key."""
+        if self._real_cipher is None or self._real_cipher.key != self.real_local_key:
+            self._real_cipher = AESCipher(self.real_local_key)
+        return self._real_cipher
+
+    def _set_session_key(self, key: bytes):
+        """Use key for the session, its crypto context is built once here."""
+        self.local_key = self.dispatcher.local_key = key
+        if key == self.real_local_key:
+            self._cipher = self.real_cipher
+        else:
+            self._cipher = AESCipher(key)
+        self.dispatcher.cipher = self._cipher
+
     def error_json(self, number=None, payload=None):
         """Return error details in JSON."""
         try:
@@ -1004,12 +909,24 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
 
     async def transport_write(self, data):
         """Write data on transport, ensure that no massive requests happen all at once."""
+        await self.transport_writelines([data])
+
+    async def transport_writelines(self, frames):
+        """Write frames back to back, ensure that no massive requests happen all at once.
+
+        The frames go out in one transport.writelines() call if batch_writes
+        is enabled, each one is paced otherwise. Other writers wait for them.
+        """
         async with self._write_lock:
-            while self.last_command_sent < 0.050:
-                await asyncio.sleep(0.010)
+            if self.batch_writes:
+                await self.pacer.wait()
+                self._last_command_sent = time.monotonic()
+                return self.transport.writelines(frames)
 
-            self._last_command_sent = time.monotonic()
-            self.transport.write(data)
+            for frame in frames:
+                await self.pacer.wait()
+                self._last_command_sent = time.monotonic()
+                self.transport.write(frame)
 
     async def close(self):
         """Close connection and abort all outstanding listeners."""
@@ -1026,6 +943,8 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
         """Clean up session."""
         self.debug(f"Cleaning up session.")
         self.real_local_key = self.local_key
+        # Invalidate the session crypto context.
+        self._cipher = self.dispatcher.cipher = None
 
         if self.heartbeater:
             self.heartbeater.cancel()
@@ -1079,15 +998,45 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
                 )
         return None
 
+    async def _ensure_session_key(self):
+        """Negotiate the session key of 3.4 and 3.5 devices, if not done yet."""
+        if self.version >= 3.4 and self.real_local_key == self.local_key:
+            # Concurrent exchanges wait for the negotiation started by the first one.
+            async with self._session_key_lock:
+                if self.real_local_key == self.local_key:
+                    self.debug("3.4 or 3.5 device: negotiating a new session key")
+                    if not await self._negotiate_session_key():
+                        self.clean_up_session()
+                        return False
+        return True
+
+    def _reply_seqno(self, cmd, seqno):
+        """Return the sequence number the response to cmd sent as seqno comes with."""
+        if cmd == HEART_BEAT:
+            return MessageDispatcher.HEARTBEAT_SEQNO
+        if cmd == UPDATEDPS:
+            return MessageDispatcher.RESET_SEQNO
+        if cmd == LAN_EXT_STREAM:
+            return MessageDispatcher.SUB_DEVICE_QUERY_SEQNO
+        return seqno
+
+    def _decode_response(self, cmd, msg):
+        """Decode the response msg to cmd, None for ACKs."""
+        # TODO: Verify stuff, e.g. CRC sequence number?
+        if cmd in [HEART_BEAT, CONTROL, CONTROL_NEW] and len(msg.payload) == 0:
+            # device may send messages with empty payload in response
+            # to a HEART_BEAT or CONTROL or CONTROL_NEW command: consider them an ACK
+            self.debug(f"ACK received for command {cmd}: ignoring: {msg.seqno}")
+            return None
+        return self._decode_payload(msg.payload)
+
     async def exchange(self, command, dps=None, nodeID=None, payload=None):
         """Send and receive a message, returning response from device."""
         if not self.is_connected:
             return None
 
-        if self.version >= 3.4 and self.real_local_key == self.local_key:
-            self.debug("3.4 or 3.5 device: negotiating a new session key")
-            if not await self._negotiate_session_key():
-                return self.clean_up_session()
+        if not await self._ensure_session_key():
+            return None
 
         self.debug(
             "Sending command %s (device type: %s) DPS: %s", command, self.dev_type, dps
@@ -1097,33 +1046,27 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
         dev_type = self.dev_type
 
         # Wait for special sequence number
-        seqno = self.seqno
-
-        if payload.cmd == HEART_BEAT:
-            seqno = MessageDispatcher.HEARTBEAT_SEQNO
-        elif payload.cmd == UPDATEDPS:
-            seqno = MessageDispatcher.RESET_SEQNO
-        elif payload.cmd == LAN_EXT_STREAM:
-            seqno = MessageDispatcher.SUB_DEVICE_QUERY_SEQNO
-
+        seqno = self._reply_seqno(payload.cmd, self.seqno)
         enc_payload = self._encode_message(payload)
+        # Register before sending, the response can't be missed this way.
+        waiter = self.dispatcher.create_waiter(seqno)
 
         try:
             await self.transport_write(enc_payload)
+        except asyncio.CancelledError:
+            waiter.cancel()
+            raise
         except Exception:  # pylint: disable=broad-except
+            waiter.cancel()
             return self.clean_up_session()
-        msg = await self.dispatcher.wait_for(seqno, payload.cmd)
+        msg = await self.dispatcher.wait_for(seqno, payload.cmd, waiter=waiter)
         if msg is None:
             self.debug("Wait was aborted for seqno %d", seqno)
             return None
 
-        # TODO: Verify stuff, e.g. CRC sequence number?
-        if real_cmd in [HEART_BEAT, CONTROL, CONTROL_NEW] and len(msg.payload) == 0:
-            # device may send messages with empty payload in response
-            # to a HEART_BEAT or CONTROL or CONTROL_NEW command: consider them an ACK
-            self.debug(f"ACK received for command {real_cmd}: ignoring: {msg.seqno}")
+        payload = self._decode_response(real_cmd, msg)
+        if payload is None:
             return None
-        payload = self._decode_payload(msg.payload)
 
         # Perform a new exchange (once) if we switched device type
         if dev_type != self.dev_type:
@@ -1136,10 +1079,51 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
             return await self.exchange(command, dps, nodeID=nodeID)
         return payload
 
-    async def status(self, cid=None):
-        """Return device status."""
-        status: dict = await self.exchange(command=DP_QUERY, nodeID=cid)
+    async def exchange_many(self, payloads: list[MessagePayload]):
+        """Send payloads back to back and return the responses, in the same order.
+
+        Responses that time out, are ACKs or fail to decode are returned as None.
+        """
+        if not self.is_connected or not await self._ensure_session_key():
+            return [None] * len(payloads)
+
+        seqnos = [
+            self._reply_seqno(payload.cmd, self.seqno + index)
+            for index, payload in enumerate(payloads)
+        ]
+        frames = self._encode_messages(payloads)
+        # Register before sending, the responses can't be missed this way.
+        waiters = [self.dispatcher.create_waiter(seqno) for seqno in seqnos]
 
+        try:
+            await self.transport_writelines(frames)
+        except asyncio.CancelledError:
+            for waiter in waiters:
+                waiter.cancel()
+            raise
+        except Exception:  # pylint: disable=broad-except
+            for waiter in waiters:
+                waiter.cancel()
+            self.clean_up_session()
+            return [None] * len(payloads)
+        for seqno, payload, waiter in zip(seqnos, payloads, waiters):
+            self.dispatcher.start_timeout(waiter, seqno, payload.cmd)
+        responses = await asyncio.gather(*waiters, return_exceptions=True)
+
+        results = []
+        for payload, msg in zip(payloads, responses):
+            if msg is None or isinstance(msg, BaseException):
+                results.append(None)
+                continue
+            try:
+                results.append(self._decode_response(payload.cmd, msg))
+            except Exception as ex:  # pylint: disable=broad-except
+                self.debug("Failed to decode the response to %s: %s", payload.cmd, ex)
+                results.append(None)
+        return results
+
+    def _cache_status(self, status, cid=None):
+        """Store the DPs of a status response and return the known DPs of cid."""
         self.dps_cache.setdefault("parent", {})
         if status and "dps" in status:
             if "cid" in status:
@@ -1149,6 +1133,54 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
 
         return self.dps_cache.get(cid or "parent", {})
 
+    async def status(self, cid=None):
+        """Return device status."""
+        status: dict = await self.exchange(command=DP_QUERY, nodeID=cid)
+        return self._cache_status(status, cid)
+
+    async def status_many(self, cids, limit=MAX_SUBDEVICE_QUERIES):
+        """Return the status of several sub-devices, querying up to limit at once.
+
+        The queries of each batch are written back to back, or pipelined
+        one by one when batch_writes is disabled.
+        """
+        if self.batch_writes:
+            return await self._status_batches(cids, limit)
+
+        slots = asyncio.Semaphore(limit)
+
+        async def query(cid):
+            async with slots:
+                return await self.status(cid=cid)
+
+        results = await asyncio.gather(
+            *(query(cid) for cid in cids), return_exceptions=True
+        )
+        return {
+            cid: status
+            for cid, status in zip(cids, results)
+            if status and isinstance(status, dict)
+        }
+
+    async def _status_batches(self, cids, limit):
+        """Query the status of cids in batches of limit DP_QUERY frames."""
+        query = partial(self._generate_payload, DP_QUERY)
+        statuses = {}
+        for start in range(0, len(cids), limit):
+            batch = cids[start : start + limit]
+            dev_type = self.dev_type
+            payloads = [query(nodeId=cid) for cid in batch]
+            responses = await self.exchange_many(payloads)
+            if dev_type != self.dev_type:
+                # The payloads were generated for the previous device type.
+                payloads = [query(nodeId=cid) for cid in batch]
+                responses = await self.exchange_many(payloads)
+
+            for cid, response in zip(batch, responses):
+                if status := self._cache_status(response, cid):
+                    statuses[cid] = status
+        return statuses
+
     async def heartbeat(self):
         """Send a heartbeat message."""
         return await self.exchange(HEART_BEAT)
@@ -1162,6 +1194,15 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
 
         return True
 
+    def set_frame_verification(self, verification):
+        """Set how received frames are verified, see FrameVerification."""
+        self.dispatcher.verification = FrameVerification(verification)
+
+    @property
+    def frame_stats(self):
+        """Return the received, failed and dropped frames counters."""
+        return self.dispatcher.frame_stats
+
     def set_updatedps_list(self, update_list):
         """Set the DPS to be requested with the update command."""
         self.dps_whitelist = update_list
@@ -1218,30 +1259,56 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
 
         return await self.exchange(command=LAN_EXT_STREAM, payload=payload)
 
-    async def detect_available_dps(self, cid=None):
-        """Return which datapoints are supported by the device."""
-        # type_0d devices need a sort of bruteforce querying in order to detect the
-        # list of available dps experience shows that the dps available are usually
-        # in the ranges [1-25] and [100-110] need to split the bruteforcing in
-        # different steps due to request payload limitation (max. length = 255)
-
-        ranges = [(2, 11), (11, 21), (21, 31), (100, 111)]
+    async def detect_available_dps(self, cid=None, known_dps=None):
+        """Return which datapoints are supported by the device.
 
-        for dps_range in ranges:
-            # dps 1 must always be sent, otherwise it might fail in case no dps is found
-            # in the requested range
+        Devices answer a status query with all their DPs, except type_0d devices
+        which only answer with the requested DPs. These are queried for known_dps
+        first, e.g. the DPs of the same product, and if all of them answer the
+        detection stops. Otherwise ranges of DPs are queried, see DP_RANGES.
+        """
+        known = [str(dp) for dp in known_dps or ()]
+        queries = deque(
+            known[start : start + DPS_PER_QUERY]
+            for start in range(0, len(known), DPS_PER_QUERY)
+        )
+        queries.extend(range(*dps_range) for dps_range in DP_RANGES)
+        ranges = {query.start for query in queries if isinstance(query, range)}
+
+        data, attempts = {}, len(DP_RANGES)
+        while queries:
+            dps = queries.popleft()
+            # dps 1 must always be sent, otherwise it might fail in case no dps is
+            # found in the requested range
             self.dps_to_request = {"1": None}
-            self.add_dps_to_request(range(*dps_range))
+            self.add_dps_to_request(dps)
             data = await self.status(cid=cid)
-            if cid and cid in data:
-                self.dps_cache.update({cid: data[cid]})
-            elif not cid and "parent" in data:
-                self.dps_cache.update({"parent": data["parent"]})
 
-            if self.dev_type == "type_0a" and not cid:
-                return self.dps_cache.get("parent", {})
-
-        return self.dps_cache.get(cid or "parent", {})
+            if self.dev_type != "type_0d":
+                # A single answer holds every DP, sub-devices may need a retry.
+                attempts -= 1
+                if data or not attempts or (self.dev_type == "type_0a" and not cid):
+                    return data
+                continue
+
+            if not isinstance(dps, range):
+                if known and isinstance(queries[0], range) and data.keys() >= {*known}:
+                    return data
+                continue
+
+            # Extend ranges while they have DPs.
+            found = {int(dp) for dp in data if dp.isdigit()}
+            if found.isdisjoint(dps):
+                continue
+            extensions = [(dps.stop, min(dps.stop + DPS_PER_QUERY, MAX_DP + 1))]
+            if dps.start >= 100:
+                extensions.append(DP_HIGH_RANGE)
+            for start, stop in extensions:
+                if start not in ranges and start < stop:
+                    ranges.add(start)
+                    queries.append(range(start, stop))
+
+        return data
 
     def add_dps_to_request(self, dp_indicies):
         """Add a datapoint (DP) to be included in requests."""
@@ -1251,7 +1318,7 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
             self.dps_to_request.update({str(index): None for index in dp_indicies})
 
     def _decode_payload(self, payload):
-        cipher = AESCipher(self.local_key)
+        cipher = self.cipher
 
         if self.version == 3.4:
             # 3.4 devices encrypt the version header in addition to the payload
@@ -1351,7 +1418,8 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
 
     async def _negotiate_session_key(self):
         self.remote_nonce = b""
-        self.local_key = self.real_local_key
+        self._set_session_key(self.real_local_key)
+        cipher = self.real_cipher
 
         rkey = await self.exchange_quick(
             MessagePayload(SESS_KEY_NEG_START, self.local_nonce), 2
@@ -1371,7 +1439,6 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
         if self.version == 3.4:
             try:
                 # self.debug("decrypting %r using %r", payload, self.real_local_key)
-                cipher = AESCipher(self.real_local_key)
                 payload = cipher.decrypt(payload, False, decode_text=False)
             except Exception as ex:
                 self.debug(
@@ -1389,7 +1456,7 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
             return False
 
         self.remote_nonce = payload[:16]
-        hmac_check = hmac.new(self.local_key, self.local_nonce, sha256).digest()
+        hmac_check = cipher.hmac(self.local_nonce)
 
         if hmac_check != payload[16:48]:
             self.debug(
@@ -1399,38 +1466,39 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
             )
 
         # self.debug("session local nonce: %r remote nonce: %r", self.local_nonce, self.remote_nonce)
-        rkey_hmac = hmac.new(self.local_key, self.remote_nonce, sha256).digest()
+        rkey_hmac = cipher.hmac(self.remote_nonce)
         await self.exchange_quick(MessagePayload(SESS_KEY_NEG_FINISH, rkey_hmac), None)
 
-        self.local_key = bytes(
+        session_key = bytes(
             [a ^ b for (a, b) in zip(self.local_nonce, self.remote_nonce)]
         )
-        # self.debug("Session nonce XOR'd: %r" % self.local_key)
+        # self.debug("Session nonce XOR'd: %r" % session_key)
 
-        cipher = AESCipher(self.real_local_key)
         if self.version == 3.4:
-            self.local_key = self.dispatcher.local_key = cipher.encrypt(
-                self.local_key, False, pad=False
-            )
+            session_key = cipher.encrypt(session_key, False, pad=False)
         else:
             iv = self.local_nonce[:12]
             self.debug("Session IV: %r", iv)
-            self.local_key = self.dispatcher.local_key = cipher.encrypt(
-                self.local_key, use_base64=False, pad=False, iv=iv
+            session_key = cipher.encrypt(
+                session_key, use_base64=False, pad=False, iv=iv
             )[12:28]
+        self._set_session_key(session_key)
 
         self.debug("Session key negotiate success! session key: %r", self.local_key)
         return True
 
+    def _encode_messages(self, msgs):
+        """Encode msgs back to back, with consecutive sequence numbers."""
+        return [self._encode_message(msg) for msg in msgs]
+
     # adds protocol header (if needed) and encrypts
     def _encode_message(self, msg):
         hmac_key = None
         iv = None
         payload = msg.payload
-        self.cipher = AESCipher(self.local_key)
 
         if self.version >= 3.4:
-            hmac_key = self.local_key
+            hmac_key = self.cipher
             if msg.cmd not in NO_PROTOCOL_HEADER_CMDS:
                 # add the 3.x header
                 payload = self.version_header + payload
@@ -1443,7 +1511,7 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
                     self.seqno, msg.cmd, None, payload, 0, True, PREFIX_6699_VALUE, True
                 )
                 self.seqno += 1  # increase message sequence number
-                data = pack_message(msg, hmac_key=self.local_key)
+                data = pack_message(msg, hmac_key=hmac_key)
                 self.debug("payload encrypted=%r", binascii.hexlify(data))
                 return data
 
@@ -1475,7 +1543,6 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
                 + payload
             )
 
-        self.cipher = None
         msg = TuyaMessage(
             self.seqno, msg.cmd, 0, payload, 0, True, PREFIX_55AA_VALUE, False
         )
@@ -1507,43 +1574,11 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
             devId(str, optional): Will be used for devId
             uid(str, optional): Will be used for uid
         """
-        json_data = command_override = None
-
-        # Create a deep copy of payload_dict. otherwise, the original references will be overwritten
-        def deepcopy_dict(_dict: dict):
-            output = _dict.copy()
-            for key, value in output.items():
-                output[key] = deepcopy_dict(value) if isinstance(value, dict) else value
-            return output
-
-        payloads = deepcopy_dict(payload_dict)
-
-        if command in payloads[self.dev_type]:
-            if "command" in payloads[self.dev_type][command]:
-                json_data = payloads[self.dev_type][command]["command"].copy()
-            if "command_override" in payloads[self.dev_type][command]:
-                command_override = payloads[self.dev_type][command]["command_override"]
-
-        if self.dev_type != "type_0a":
-            if (
-                json_data is None
-                and command in payloads["type_0a"]
-                and "command" in payloads["type_0a"][command]
-            ):
-                json_data = payloads["type_0a"][command]["command"].copy()
-            if (
-                command_override is None
-                and command in payloads["type_0a"]
-                and "command_override" in payloads["type_0a"][command]
-            ):
-                command_override = payloads["type_0a"][command]["command_override"]
-
-        if command_override is None:
-            command_override = command
-        if json_data is None:
-            # I have yet to see a device complain about included but unneeded attribs, but they *will*
-            # complain about missing attribs, so just include them all unless otherwise specified
-            json_data = {"gwId": "", "devId": "", "uid": "", "t": "", "cid": ""}
+        command_override, template = get_payload_template(self.dev_type, command)
+        # Only the nested "data" dict needs a copy, the rest of the values are replaced.
+        json_data = template.copy()
+        if isinstance(json_data.get("data"), dict):
+            json_data["data"] = json_data["data"].copy()
 
         if "gwId" in json_data:
             if gwId is not None:
@@ -1595,12 +1630,8 @@ class TuyaProtocol(asyncio.Protocol, ContextualLogger):
         if reqType and "reqType" in json_data:
             json_data["reqType"] = reqType
 
-        if json_data == "":
-            payload = ""
-        else:
-            payload = json.dumps(json_data)
-        # if spaces are not removed device does not respond!
-        payload = payload.replace(" ", "").encode("utf-8")
+        # Compact separators: if spaces are not removed device does not respond!
+        payload = json.dumps(json_data, separators=(",", ":")).encode("utf-8")
         self.debug("Sending payload: %s", payload)
 
         return MessagePayload(command_override, payload)
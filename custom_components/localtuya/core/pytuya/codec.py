@@ -0,0 +1,543 @@
+"""Tuya frame codec: message records, framing, checksums and encryption.
+
+The header, retcode and trailer layouts are compiled once into struct.Struct
+objects, and read in place from the received frame with unpack_from.
+"""
+
+import base64
+import binascii
+import hmac
+import logging
+import struct
+import time
+from typing import Self
+from hashlib import sha256
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+_LOGGER = logging.getLogger(__package__)
+
+# Tuya Packet Format
+MESSAGE_RECV_HEADER_FMT = ">5I"  # 4*uint32: prefix, seqno, cmd, length, retcode
+MESSAGE_HEADER_FMT = MESSAGE_HEADER_FMT_55AA = (
+    ">4I"  # 4*uint32: prefix, seqno, cmd, length [, retcode]
+)
+MESSAGE_HEADER_FMT_6699 = ">IHIII"  # 4*uint32: prefix, unknown, seqno, cmd, length
+MESSAGE_RETCODE_FMT = ">I"  # retcode for received messages
+MESSAGE_END_FMT = MESSAGE_END_FMT_55AA = ">2I"  # 2*uint32: crc, suffix
+MESSAGE_END_FMT_HMAC = ">32sI"  # 32s:hmac, uint32:suffix
+MESSAGE_END_FMT_6699 = ">16sI"  # 16s:tag, suffix
+PREFIX_VALUE = PREFIX_55AA_VALUE = 0x000055AA
+PREFIX_BIN = PREFIX_55AA_BIN = b"\x00\x00U\xaa"
+SUFFIX_VALUE = SUFFIX_55AA_VALUE = 0x0000AA55
+SUFFIX_BIN = SUFFIX_55AA_BIN = b"\x00\x00\xaaU"
+PREFIX_6699_VALUE = 0x00006699
+PREFIX_6699_BIN = b"\x00\x00\x66\x99"
+SUFFIX_6699_VALUE = 0x00009966
+SUFFIX_6699_BIN = b"\x00\x00\x99\x66"
+
+STRUCT_RECV_HEADER = struct.Struct(MESSAGE_RECV_HEADER_FMT)
+STRUCT_HEADER_55AA = struct.Struct(MESSAGE_HEADER_FMT_55AA)
+STRUCT_HEADER_6699 = struct.Struct(MESSAGE_HEADER_FMT_6699)
+STRUCT_RETCODE = struct.Struct(MESSAGE_RETCODE_FMT)
+STRUCT_END_55AA = struct.Struct(MESSAGE_END_FMT_55AA)
+STRUCT_END_HMAC = struct.Struct(MESSAGE_END_FMT_HMAC)
+STRUCT_END_6699 = struct.Struct(MESSAGE_END_FMT_6699)
+# The 6699 payload starts with the GCM nonce.
+IV_LEN = 12
+
+
+class _Record:
+    """Base of the per-frame records, compared and unpacked like tuples.
+
+    Records are created for every frame sent or received, __slots__ keeps
+    them without an instance dict.
+    """
+
+    __slots__ = ()
+
+    def _astuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __iter__(self):
+        return iter(self._astuple())
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    def __hash__(self):
+        return hash(self._astuple())
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{self.__class__.__name__}({fields})"
+
+
+class TuyaHeader(_Record):
+    """Header of a received frame."""
+
+    __slots__ = ("prefix", "seqno", "cmd", "length", "total_length")
+
+    def __init__(self, prefix, seqno, cmd, length, total_length):
+        """Initialize a new TuyaHeader."""
+        self.prefix = prefix
+        self.seqno = seqno
+        self.cmd = cmd
+        self.length = length
+        self.total_length = total_length
+
+
+class MessagePayload(_Record):
+    """Command and payload of a message that is yet to be encoded."""
+
+    __slots__ = ("cmd", "payload")
+
+    def __init__(self, cmd, payload):
+        """Initialize a new MessagePayload."""
+        self.cmd = cmd
+        self.payload = payload
+
+
+class TuyaMessage(_Record):
+    """A decoded frame, or a frame to be packed."""
+
+    __slots__ = (
+        "seqno",
+        "cmd",
+        "retcode",
+        "payload",
+        "crc",
+        "crc_good",
+        "prefix",
+        "iv",
+    )
+
+    def __init__(
+        self, seqno, cmd, retcode, payload, crc, crc_good=True, prefix=0x55AA, iv=None
+    ):
+        """Initialize a new TuyaMessage."""
+        self.seqno = seqno
+        self.cmd = cmd
+        self.retcode = retcode
+        self.payload = payload
+        self.crc = crc
+        self.crc_good = crc_good
+        self.prefix = prefix
+        self.iv = iv
+
+
+class DecodeError(Exception):
+    """Specific Exception caused by decoding error."""
+
+    pass
+
+
+def pack_message(msg, hmac_key=None):
+    """Pack a TuyaMessage into bytes.
+
+    hmac_key can be the key itself or an AESCipher already prepared for it.
+    """
+    payload = msg.payload
+    if msg.prefix == PREFIX_55AA_VALUE:
+        end = STRUCT_END_HMAC if hmac_key else STRUCT_END_55AA
+        header_len = STRUCT_HEADER_55AA.size
+        body_len = header_len + len(payload)
+
+        data = bytearray(body_len + end.size)
+        STRUCT_HEADER_55AA.pack_into(
+            data, 0, msg.prefix, msg.seqno, msg.cmd, len(payload) + end.size
+        )
+        data[header_len:body_len] = payload
+        # Calculate CRC, add it together with suffix
+        with memoryview(data) as view:
+            if hmac_key:
+                crc = AESCipher.from_key(hmac_key).hmac(view[:body_len])
+            else:
+                crc = binascii.crc32(view[:body_len]) & 0xFFFFFFFF
+        end.pack_into(data, body_len, crc, SUFFIX_VALUE)
+        return bytes(data)
+
+    if msg.prefix != PREFIX_6699_VALUE:
+        raise ValueError(
+            "pack_message() cannot handle message format %08X" % msg.prefix
+        )
+    if not hmac_key:
+        raise TypeError("key must be provided to pack 6699-format messages")
+
+    end = STRUCT_END_6699
+    if type(msg.retcode) == int:
+        payload = STRUCT_RETCODE.pack(msg.retcode) + payload
+    msg_len = len(payload) + (end.size - 4) + IV_LEN
+    header = STRUCT_HEADER_6699.pack(msg.prefix, 0, msg.seqno, msg.cmd, msg_len)
+
+    encrypted = AESCipher.from_key(hmac_key).encrypt(
+        payload,
+        use_base64=False,
+        pad=False,
+        iv=True if not msg.iv else msg.iv,
+        header=header[4:],
+    )
+    return b"".join((header, encrypted, SUFFIX_6699_BIN))
+
+
+def unpack_message(
+    data, hmac_key=None, header=None, no_retcode=False, logger=_LOGGER, verify=True
+):
+    """Unpack bytes into a TuyaMessage.
+
+    hmac_key can be the key itself or an AESCipher already prepared for it.
+    With verify=False the CRC or HMAC of 55AA frames is not checked. The GCM tag
+    of 6699 frames is, since decrypting them checks it anyway.
+    """
+    if header is None:
+        header = parse_header(data)
+
+    if header.prefix == PREFIX_55AA_VALUE:
+        # 4-word header plus return code
+        header_len = STRUCT_HEADER_55AA.size
+        end = STRUCT_END_HMAC if hmac_key else STRUCT_END_55AA
+        retcode_len = 0 if no_retcode else STRUCT_RETCODE.size
+        msg_len = header_len + header.length
+    elif header.prefix == PREFIX_6699_VALUE:
+        if not hmac_key:
+            raise TypeError("key must be provided to unpack 6699-format messages")
+        header_len = STRUCT_HEADER_6699.size
+        end = STRUCT_END_6699
+        retcode_len = 0
+        msg_len = header_len + header.length + 4
+    else:
+        raise ValueError(
+            "unpack_message() cannot handle message format %08X" % header.prefix
+        )
+
+    if len(data) < msg_len:
+        logger.debug(
+            "unpack_message(): not enough data to unpack payload! need %d but only have %d",
+            header_len + header.length,
+            len(data),
+        )
+        raise DecodeError(f"Not enough data to unpack payload: {data}")
+
+    end_offset = msg_len - end.size
+    if end_offset < header_len + retcode_len:
+        raise DecodeError(f"Message length {header.length} is too short: {data}")
+
+    # the retcode is technically part of the payload, but strip it as we do not want it here
+    retcode = STRUCT_RETCODE.unpack_from(data, header_len)[0] if retcode_len else 0
+    crc, suffix = end.unpack_from(data, end_offset)
+
+    if header.prefix == PREFIX_55AA_VALUE:
+        payload = data[header_len + retcode_len : end_offset]
+        if not verify:
+            have_crc = crc
+        elif hmac_key:
+            with memoryview(data) as view:
+                have_crc = AESCipher.from_key(hmac_key).hmac(view[:end_offset])
+        else:
+            with memoryview(data) as view:
+                have_crc = binascii.crc32(view[:end_offset]) & 0xFFFFFFFF
+
+        if suffix != SUFFIX_VALUE:
+            logger.debug("Suffix prefix wrong! %08X != %08X", suffix, SUFFIX_VALUE)
+
+        if crc != have_crc:
+            if hmac_key:
+                logger.debug(
+                    "HMAC checksum wrong! %r != %r",
+                    binascii.hexlify(have_crc),
+                    binascii.hexlify(crc),
+                )
+            else:
+                logger.debug("CRC wrong! %08X != %08X", have_crc, crc)
+        crc_good = crc == have_crc
+        iv = None
+    elif header.prefix == PREFIX_6699_VALUE:
+        iv = bytes(data[header_len : header_len + IV_LEN])
+        payload = data[header_len + IV_LEN : end_offset]
+        try:
+            cipher = AESCipher.from_key(hmac_key)
+            payload = cipher.decrypt(
+                payload,
+                use_base64=False,
+                decode_text=False,
+                iv=iv,
+                header=data[4:header_len],
+                tag=crc,
+            )
+            crc_good = True
+        except:
+            crc_good = False
+
+        retcode_len = STRUCT_RETCODE.size
+        if no_retcode is False:
+            pass
+        elif (
+            no_retcode is None
+            and payload[0:1] != b"{"
+            and payload[retcode_len : retcode_len + 1] == b"{"
+        ):
+            retcode_len = STRUCT_RETCODE.size
+        else:
+            retcode_len = 0
+        if retcode_len:
+            retcode = STRUCT_RETCODE.unpack_from(payload)[0]
+            payload = payload[retcode_len:]
+
+    return TuyaMessage(
+        header.seqno, header.cmd, retcode, payload, crc, crc_good, header.prefix, iv
+    )
+
+
+def _unpack_header(data, offset):
+    """Return the header at offset and None, or None and why it isn't valid."""
+    if data[offset : offset + 4] == PREFIX_6699_BIN:
+        header = STRUCT_HEADER_6699
+    else:
+        header = STRUCT_HEADER_55AA
+
+    if len(data) - offset < header.size:
+        return None, "Not enough data to unpack header"
+
+    unpacked = header.unpack_from(data, offset)
+    prefix = unpacked[0]
+
+    if prefix == PREFIX_55AA_VALUE:
+        prefix, seqno, cmd, payload_len = unpacked
+        total_length = payload_len + header.size
+    elif prefix == PREFIX_6699_VALUE:
+        prefix, unknown, seqno, cmd, payload_len = unpacked
+        # seqno |= unknown << 32
+        total_length = payload_len + header.size + len(SUFFIX_6699_BIN)
+    else:
+        return (
+            None,
+            f"Header prefix wrong! {prefix} is not {PREFIX_55AA_VALUE} or {PREFIX_6699_VALUE}",
+        )
+
+    # sanity check. currently the max payload length is somewhere around 300 bytes
+    if payload_len > 2000:
+        return (
+            None,
+            f"Header claims the packet size is over 2000 bytes!  It is most likely corrupt. Claimed size: {payload_len} bytes. fmt: {header.format} unpacked: {unpacked}",
+        )
+
+    return TuyaHeader(prefix, seqno, cmd, payload_len, total_length), None
+
+
+def parse_header(data, logger=_LOGGER, offset=0):
+    """Unpack bytes into a TuyaHeader, optionally starting at offset."""
+    header, err = _unpack_header(data, offset)
+    if header is None:
+        logger.error(err)
+        raise DecodeError(err)
+    return header
+
+
+def read_header(data, offset=0) -> TuyaHeader | None:
+    """Like parse_header() but return None for truncated or corrupted headers."""
+    return _unpack_header(data, offset)[0]
+
+
+class FrameDecoder:
+    """Incremental decoder splitting a TCP stream into complete Tuya frames.
+
+    Received data is appended to a single bytearray and consumed through a read
+    offset, the buffer is compacted once per feed instead of once per frame.
+    The prefixes are only searched for when the stream has to be resynchronized.
+    """
+
+    HEADER_55AA_LEN = STRUCT_HEADER_55AA.size
+    HEADER_6699_LEN = STRUCT_HEADER_6699.size
+    PREFIX_LEN = len(PREFIX_55AA_BIN)
+
+    def __init__(self, logger=_LOGGER):
+        """Initialize a new FrameDecoder."""
+        self.logger = logger
+        self._buffer = bytearray()
+        self._offset = 0
+        self._header: TuyaHeader | None = None
+
+    def __len__(self):
+        """Return the number of buffered bytes that haven't been consumed yet."""
+        return len(self._buffer) - self._offset
+
+    def reset(self):
+        """Drop any buffered data."""
+        self._buffer.clear()
+        self._offset = 0
+        self._header = None
+
+    def feed(self, data) -> list[tuple[TuyaHeader, bytes]]:
+        """Add data to the stream and return the (header, frame) of every complete frame."""
+        buffer = self._buffer
+        buffer += data
+
+        frames = []
+        view = None
+        while (header := self._header or self._next_header(buffer)) is not None:
+            start = self._offset
+            end = start + header.total_length
+            if len(buffer) < end:
+                # Keep the parsed header until the rest of the frame arrives.
+                self._header = header
+                break
+            if view is None:
+                view = memoryview(buffer)
+            frames.append((header, bytes(view[start:end])))
+            self._header = None
+            self._offset = end
+
+        if view is not None:
+            view.release()
+        # Compact once all the complete frames has been consumed.
+        if self._offset:
+            del buffer[: self._offset]
+            self._offset = 0
+        return frames
+
+    def _next_header(self, buffer):
+        """Return the header at the read offset, resync the stream if needed."""
+        while (available := len(buffer) - self._offset) >= self.PREFIX_LEN:
+            offset = self._offset
+            if buffer.startswith(PREFIX_55AA_BIN, offset):
+                header_len = self.HEADER_55AA_LEN
+            elif buffer.startswith(PREFIX_6699_BIN, offset):
+                header_len = self.HEADER_6699_LEN
+            else:
+                self._resync(buffer)
+                continue
+
+            if available < header_len:
+                return None
+            try:
+                return parse_header(buffer, logger=self.logger, offset=offset)
+            except DecodeError:
+                # Corrupted header, skip this prefix and look for the next one.
+                self._offset += 1
+                self._resync(buffer)
+        return None
+
+    def _resync(self, buffer):
+        """Move the read offset to the next known prefix, or drop the junk data."""
+        offset = self._offset
+        found = [
+            index
+            for prefix in (PREFIX_55AA_BIN, PREFIX_6699_BIN)
+            if (index := buffer.find(prefix, offset)) >= 0
+        ]
+        if found:
+            self._offset = min(found)
+            self.logger.debug(
+                "Message prefix offset not at the start, skipped %d bytes: %r",
+                self._offset - offset,
+                bytes(buffer[offset : self._offset]),
+            )
+        else:
+            # Keep the tail in-case it is the beginning of a split prefix.
+            self._offset = max(offset, len(buffer) - self.PREFIX_LEN + 1)
+            self.logger.debug(
+                "Got unexpected Message prefix: %r",
+                bytes(buffer[offset : self._offset]),
+            )
+
+
+class AESCipher:
+    """Cipher module for Tuya communication.
+
+    The ECB contexts, the GCM cipher and the keyed HMAC state are prepared once
+    per key and reused for every message, so an AESCipher should be kept for as
+    long as the key is in use, i.e. for the whole session.
+    """
+
+    def __init__(self, key):
+        """Initialize a new AESCipher."""
+        self.block_size = 16
+        self.key = key
+        self.cipher = Cipher(algorithms.AES(key), modes.ECB(), default_backend())
+        # ECB has no state between blocks, the contexts are never finalized and
+        # can be fed with any block aligned data.
+        self._ecb_encryptor = self.cipher.encryptor()
+        self._ecb_decryptor = self.cipher.decryptor()
+        self._gcm: AESGCM | None = None
+        self._hmac = None
+
+    @classmethod
+    def from_key(cls, key) -> Self:
+        """Return key if it's already an AESCipher, otherwise build one for it."""
+        return key if isinstance(key, cls) else cls(key)
+
+    @property
+    def gcm(self) -> AESGCM:
+        """Return the GCM cipher of the key."""
+        if self._gcm is None:
+            self._gcm = AESGCM(self.key)
+        return self._gcm
+
+    def hmac(self, data) -> bytes:
+        """Return the HMAC-SHA256 digest of data signed with the key."""
+        if self._hmac is None:
+            self._hmac = hmac.new(self.key, digestmod=sha256)
+        digest = self._hmac.copy()
+        digest.update(data)
+        return digest.digest()
+
+    def encrypt(self, raw, use_base64=True, pad=True, iv=False, header=None):
+        """Encrypt data to be sent to device."""
+        if iv:
+            if iv is True:
+                if _LOGGER.isEnabledFor(logging.DEBUG):
+                    iv = b"0123456789ab"
+                else:
+                    iv = str(time.time() * 10)[:12].encode("utf8")
+            # AESGCM returns the tag appended to the encrypted data.
+            crypted_text = iv + self.gcm.encrypt(iv, raw, header or None)
+        else:
+            if pad:
+                raw = self._pad(raw)
+            crypted_text = self._ecb_update(self._ecb_encryptor, raw)
+        return base64.b64encode(crypted_text) if use_base64 else crypted_text
+
+    def decrypt(
+        self, enc, use_base64=True, decode_text=True, iv=False, header=None, tag=None
+    ):
+        """Decrypt data from device."""
+        if not iv:
+            if use_base64:
+                enc = base64.b64decode(enc)
+
+        if iv:
+            if iv is True:
+                iv = enc[:12]
+                enc = enc[12:]
+            if tag is None:
+                decryptor = Cipher(
+                    algorithms.AES(self.key), modes.CTR(iv + b"\x00\x00\x00\x02")
+                ).decryptor()
+                raw = decryptor.update(enc) + decryptor.finalize()
+            else:
+                raw = self.gcm.decrypt(iv, bytes(enc) + tag, header or None)
+        else:
+            raw = self._ecb_update(self._ecb_decryptor, enc)
+            raw = self._unpad(raw)
+
+        return raw.decode("utf-8") if decode_text else raw
+
+    def _ecb_update(self, context, data):
+        """Run data through a shared ECB context, data must be block aligned."""
+        if len(data) % self.block_size:
+            raise ValueError(
+                "The length of the provided data is not a multiple of the block length."
+            )
+        return context.update(data)
+
+    def _pad(self, data):
+        padnum = self.block_size - len(data) % self.block_size
+        return data + padnum * chr(padnum).encode()
+
+    @staticmethod
+    def _unpad(data):
+        return data[: -ord(data[len(data) - 1 :])]
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import copy
 import logging
+import time
 from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
@@ -17,6 +18,12 @@ from .const import CONF_LOCAL_KEY, CONF_USER_ID, DOMAIN, CONF_NO_CLOUD, DATA_DIS
 CLOUD_DEVICES = "cloud_devices"
 DEVICE_CONFIG = "device_config"
 DEVICE_CLOUD_INFO = "device_cloud_info"
+DEVICE_COMMAND_QUEUE = "device_command_queue"
+DEVICE_RECONNECT = "device_reconnect"
+DEVICE_STATE_WRITES = "device_state_writes"
+DEVICE_FRAMES = "device_frames"
+DEVICE_LAST_BROADCAST = "device_last_broadcast_seconds_ago"
+STARTUP_TIMELINE = "startup_timeline"
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -48,6 +55,8 @@ async def async_get_config_entry_diagnostics(
                 data[CLOUD_DEVICES][dev_id][obf] = obfuscate(ob, obf_len, obf_len)
     if discovery := hass.data[DOMAIN].get(DATA_DISCOVERY):
         data["Discovered_Devices"] = discovery.devices
+    if hass_localtuya.startup:
+        data[STARTUP_TIMELINE] = hass_localtuya.startup.timeline
     return data
 
 
@@ -75,9 +84,20 @@ async def async_get_device_diagnostics(
         # local_key_obfuscated = "{local_key[0:3]}...{local_key[-3:]}"
         # data[DEVICE_CLOUD_INFO][CONF_LOCAL_KEY] = local_key_obfuscated
 
+    for device in hass_localtuya.devices.values():
+        if device.id == dev_id and not device._fake_gateway:
+            data[DEVICE_COMMAND_QUEUE] = device.write_stats
+            data[DEVICE_RECONNECT] = device.reconnect_stats
+            data[DEVICE_STATE_WRITES] = device.state_writes
+            data[DEVICE_FRAMES] = device.frame_stats
+    if hass_localtuya.startup:
+        data[STARTUP_TIMELINE] = hass_localtuya.startup.timeline.get(dev_id)
+
     # data["log"] = hass.data[DOMAIN][CONF_DEVICES][dev_id].logger.retrieve_log()
     if discovery := hass.data[DOMAIN].get(DATA_DISCOVERY):
         data["Discovered_Devices"] = discovery.devices.get(dev_id)
+        if last_seen := discovery.last_seen.get(dev_id):
+            data[DEVICE_LAST_BROADCAST] = round(time.monotonic() - last_seen)
     return data
 
 
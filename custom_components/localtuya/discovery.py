@@ -7,52 +7,110 @@ Maintained by @xZetsubou
 """
 
 import os
+import argparse
 import asyncio
 import json
 import logging
+import time
+from bisect import bisect_left, insort
+from contextlib import suppress
+from functools import partial
 from hashlib import md5
 from socket import inet_aton
 
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-
 from .entity import pytuya
 
 _LOGGER = logging.getLogger(__name__)
 
 UDP_KEY = md5(b"yGAdlopoPVldABfn").digest()
 
-PREFIX_55AA_BIN = b"\x00\x00U\xaa"
-PREFIX_6699_BIN = b"\x00\x00\x66\x99"
-UDP_COMMAND = b"\x00\x00\x00\x00"
+# Devices broadcast on 6666 (plaintext) and 6667 (encrypted), the Tuya app on 7000.
+PORTS = (6666, 6667)
+APP_PORT = 7000
 
 DEFAULT_TIMEOUT = 6.0
+# Unchanged broadcasts of a device are passed to the callback once per interval.
+REFRESH_INTERVAL = 30.0
+# Broadcasts to decode within a second before they are decoded in a worker thread.
+BURST_SIZE = 64
+
+# Devices probed at once by scan(), and the time allowed for each probe.
+PROBE_CONCURRENCY = 8
+PROBE_TIMEOUT = 15.0
+
+# Smallest frame lengths, header excluded: retcode and CRC trailer for 55AA,
+# IV and GCM tag for 6699.
+MIN_55AA_LENGTH = pytuya.STRUCT_RETCODE.size + pytuya.STRUCT_END_55AA.size
+MIN_6699_LENGTH = pytuya.IV_LEN + pytuya.STRUCT_END_6699.size - 4
+
+
+class BroadcastDecoder:
+    """Decode broadcasts with the pytuya frame codec.
+
+    Handles plaintext and ECB encrypted 55AA frames, GCM encrypted 6699 frames
+    and bare payloads. Every step checks its input instead of relying on
+    exceptions, broadcasts that can't be decoded return None. The cipher
+    contexts are reused, so an instance must only be used by one thread.
+    """
+
+    def __init__(self):
+        """Initialize a new BroadcastDecoder."""
+        self.cipher = pytuya.AESCipher(UDP_KEY)
 
+    def decode(self, data: bytes) -> dict | None:
+        """Return the JSON object of a broadcast."""
+        if not (payload := self.payload(data)):
+            return None
+        try:
+            decoded = json.loads(payload)
+        except ValueError:
+            return None
+        return decoded if isinstance(decoded, dict) else None
+
+    def decode_many(self, packets: list[bytes]) -> list[dict | None]:
+        """Decode a batch of broadcasts."""
+        return [self.decode(data) for data in packets]
 
-def decrypt(msg, key):
-    def _unpad(data):
-        return data[: -ord(data[len(data) - 1 :])]
+    def payload(self, data: bytes) -> bytes | None:
+        """Return the JSON text of a broadcast."""
+        prefix = data[:4]
+        if prefix == pytuya.PREFIX_55AA_BIN:
+            header = pytuya.read_header(data)
+            if not header or header.length < MIN_55AA_LENGTH:
+                return None
+            if len(data) < header.total_length:
+                return None
+            # The CRC isn't checked, a broadcast is only a hint to connect.
+            msg = pytuya.unpack_message(data, header=header, verify=False)
+            return self._plaintext(msg.payload)
 
-    cipher = Cipher(algorithms.AES(key), modes.ECB(), default_backend())
-    decryptor = cipher.decryptor()
-    return _unpad(decryptor.update(msg) + decryptor.finalize()).decode()
+        if prefix == pytuya.PREFIX_6699_BIN:
+            header = pytuya.read_header(data)
+            if not header or header.length < MIN_6699_LENGTH:
+                return None
+            if len(data) < header.total_length:
+                return None
+            msg = pytuya.unpack_message(data, self.cipher, header, no_retcode=None)
+            # app sometimes has extra bytes at the end
+            return msg.payload.rstrip(b"\0") if msg.crc_good else None
 
+        return self._plaintext(data)
 
-def decrypt_udp(message):
-    """Decrypt encrypted UDP broadcasts."""
-    if message[:4] == PREFIX_55AA_BIN:
-        payload = message[20:-8]
-        if message[8:12] == UDP_COMMAND:
+    def _plaintext(self, payload: bytes) -> bytes | None:
+        """Return payload, decrypted unless it's plaintext JSON already."""
+        if payload[:1] == b"{":
             return payload
-        return decrypt(payload, UDP_KEY)
-    if message[:4] == PREFIX_6699_BIN:
-        unpacked = pytuya.unpack_message(message, hmac_key=UDP_KEY, no_retcode=None)
-        payload = unpacked.payload.decode()
-        # app sometimes has extra bytes at the end
-        while payload[-1] == chr(0):
-            payload = payload[:-1]
-        return payload
-    return decrypt(message, UDP_KEY)
+        if not payload or len(payload) % self.cipher.block_size:
+            return None
+        return self.cipher.decrypt(payload, use_base64=False, decode_text=False)
+
+
+def ip_key(ip):
+    """Return the sort key of an IP address."""
+    try:
+        return inet_aton(ip)
+    except (OSError, TypeError):
+        return bytes(4)
 
 
 class TuyaDiscovery(asyncio.DatagramProtocol):
@@ -60,25 +118,53 @@ class TuyaDiscovery(asyncio.DatagramProtocol):
 
     def __init__(self, callback=None):
         """Initialize a new BaseDiscovery."""
-        self.devices = {}
+        self._devices: dict[str, dict] = {}
+        # (IP, gwId) of every device, kept sorted to list devices by IP.
+        self._index: list[tuple[bytes, str]] = []
+        self._sorted_devices: dict[str, dict] | None = {}
+        # Liveness index: time of the last broadcast per gwId.
+        self.last_seen: dict[str, float] = {}
+        # Hash of the last broadcast and its gwId per source address.
+        self._packets: dict[str, tuple[int, str | None]] = {}
+        # Time of the last callback per gwId.
+        self._notified: dict[str, float] = {}
         self._listeners = []
         self._callback = callback
+        self._decoder = BroadcastDecoder()
+        # Bursts are decoded by a worker thread, with its own decoder.
+        self._worker = BroadcastDecoder()
+        self._backlog: list[tuple[str, int, bytes]] = []
+        self._decoding: asyncio.Future | None = None
+        self._window_start = 0.0
+        self._window_count = 0
+
+    @property
+    def devices(self) -> dict[str, dict]:
+        """Return the discovered devices, sorted by IP."""
+        if self._sorted_devices is None:
+            devices = self._devices
+            self._sorted_devices = {gwid: devices[gwid] for _, gwid in self._index}
+        return self._sorted_devices
 
     async def start(self):
         """Start discovery by listening to broadcasts."""
         loop = asyncio.get_running_loop()
         op_reuse_port = {"reuse_port": True} if os.name != "nt" else {}
-        listener = loop.create_datagram_endpoint(
-            lambda: self, local_addr=("0.0.0.0", 6666), **op_reuse_port
-        )
-        encrypted_listener = loop.create_datagram_endpoint(
-            lambda: self, local_addr=("0.0.0.0", 6667), **op_reuse_port
-        )
-        # tuyaApp_encrypted_listener = loop.create_datagram_endpoint(
-        #     lambda: self, local_addr=("0.0.0.0", 7000), **op_reuse_port
-        # )
-        self._listeners = await asyncio.gather(listener, encrypted_listener)
-        _LOGGER.debug("Listening to broadcasts on UDP port 6666, 6667")
+
+        def listen(port):
+            return loop.create_datagram_endpoint(
+                lambda: self, local_addr=("0.0.0.0", port), **op_reuse_port
+            )
+
+        self._listeners = list(await asyncio.gather(*(listen(port) for port in PORTS)))
+        ports = list(PORTS)
+        # Another service may already use the app port, it's optional.
+        try:
+            self._listeners.append(await listen(APP_PORT))
+            ports.append(APP_PORT)
+        except OSError as ex:
+            _LOGGER.debug("Not listening to UDP port %s: %s", APP_PORT, ex)
+        _LOGGER.debug("Listening to broadcasts on UDP port %s", ports)
 
     def close(self):
         """Stop discovery."""
@@ -86,45 +172,264 @@ class TuyaDiscovery(asyncio.DatagramProtocol):
         for transport, _ in self._listeners:
             transport.close()
 
+    async def drain(self):
+        """Wait until the broadcasts received so far are decoded."""
+        while self._decoding:
+            await asyncio.wait([self._decoding])
+
     def datagram_received(self, data, addr):
         """Handle received broadcast message."""
-        try:
-            try:
-                data = decrypt_udp(data)
-            except Exception:  # pylint: disable=broad-except
-                data = data.decode()
-            decoded = json.loads(data)
+        host, digest = addr[0], hash(data)
+        # Devices repeat the same broadcast, skip decoding it again.
+        if (packet := self._packets.get(host)) and packet[0] == digest:
+            if (gwid := packet[1]) in self._devices:
+                self._device_seen(gwid, changed=False)
+            return
+
+        now = time.monotonic()
+        if now - self._window_start >= 1:
+            self._window_start, self._window_count = now, 0
+        self._window_count += 1
+        if (
+            self._backlog
+            or self._decoding is not None
+            or self._window_count > BURST_SIZE
+        ):
+            # Keep the order, while a batch is decoded everything goes through it.
+            self._backlog.append((host, digest, data))
+            if self._decoding is None:
+                self._decode_backlog()
+            return
+
+        self._decoded(host, digest, data, self._decoder.decode(data))
+
+    def _decode_backlog(self):
+        """Decode the backlog of broadcasts in a worker thread."""
+        batch, self._backlog = self._backlog, []
+        packets = [data for _, _, data in batch]
+        loop = asyncio.get_running_loop()
+        self._decoding = loop.run_in_executor(None, self._worker.decode_many, packets)
+        self._decoding.add_done_callback(partial(self._backlog_decoded, batch))
+
+    def _backlog_decoded(self, batch, future: asyncio.Future):
+        """Handle the broadcasts decoded by the worker, then start the next batch."""
+        self._decoding = None
+        if future.cancelled() or future.exception():
+            _LOGGER.debug("Failed to decode %d broadcasts", len(batch))
+        else:
+            for (host, digest, data), decoded in zip(batch, future.result()):
+                self._decoded(host, digest, data, decoded)
+
+        if self._backlog:
+            self._decode_backlog()
+
+    def _decoded(self, host, digest, data, decoded: dict | None):
+        """Handle a decoded broadcast."""
+        gwid = decoded.get("gwId") if decoded else None
+        self._packets[host] = (digest, gwid)
+        if decoded is None:
+            _LOGGER.debug("Failed to decode broadcast from %r: %r", host, data)
+        elif gwid is None:
+            _LOGGER.debug("Broadcast from app from ip: %s", host)
+        else:
             self.device_found(decoded)
-        except:
-            # _LOGGER.debug("Bordcast from app from ip: %s", addr[0])
-            _LOGGER.debug("Failed to decode broadcast from %r: %r", addr[0], data)
 
     def device_found(self, device):
         """Discover a new device."""
         gwid, ip = device.get("gwId"), device.get("ip")
-        # If device found but the ip changed.
-        if gwid in self.devices and (self.devices[gwid].get("ip") != ip):
-            self.devices.pop(gwid)
-
-        if gwid not in self.devices:
-            self.devices[gwid] = device
-            # Sort devices by ip.
-            sort_devices = sorted(
-                self.devices.items(), key=lambda i: inet_aton(i[1].get("ip", "0"))
-            )
-            self.devices = dict(sort_devices)
+        known = self._devices.get(gwid)
+        if known == device:
+            return self._device_seen(gwid, changed=False)
 
+        # If device found but the ip changed.
+        if known is not None:
+            index = self._index
+            del index[bisect_left(index, (ip_key(known.get("ip")), gwid))]
+        else:
             _LOGGER.debug("Discovered device: %s", device)
-        if self._callback:
-            self._callback(device)
+        insort(self._index, (ip_key(ip), gwid))
+        self._devices[gwid] = device
+        self._sorted_devices = None
+        self._device_seen(gwid, changed=True)
+
+    def _device_seen(self, gwid, changed):
+        """Record a broadcast from gwid, the callback only sees changes and refreshes."""
+        now = time.monotonic()
+        if self._callback and (
+            changed or now - self._notified.get(gwid, 0.0) >= REFRESH_INTERVAL
+        ):
+            self._notified[gwid] = now
+            self._callback(self._devices[gwid])
+        # Updated after the callback, so it can still tell how long gwid was silent.
+        self.last_seen[gwid] = now
+
+
+def load_broadcasts(path) -> list[tuple[bytes, tuple[str, int]]]:
+    """Load recorded broadcasts, JSON lines of host, port and hex encoded data."""
+    with open(path, encoding="utf-8") as file:
+        packets = [json.loads(line) for line in file if line.strip()]
+    return [
+        (bytes.fromhex(packet["data"]), (packet["host"], packet["port"]))
+        for packet in packets
+    ]
+
+
+async def discover(timeout=DEFAULT_TIMEOUT, expected=(), callback=None):
+    """Discover and return devices on local network.
+
+    Devices are passed to callback as they are found. Discovery stops early
+    once every device ID of expected has been seen, otherwise after timeout.
+    """
+    remaining = set(expected)
+    complete = asyncio.Event()
 
+    def device_found(device):
+        if callback:
+            callback(device)
+        if remaining:
+            remaining.discard(device.get("gwId"))
+            if not remaining:
+                complete.set()
 
-async def discover():
-    """Discover and return devices on local network."""
-    discovery = TuyaDiscovery()
+    discovery = TuyaDiscovery(device_found)
     try:
         await discovery.start()
-        await asyncio.sleep(DEFAULT_TIMEOUT)
+        with suppress(TimeoutError):
+            async with asyncio.timeout(timeout):
+                await complete.wait()
     finally:
         discovery.close()
     return discovery.devices
+
+
+async def replay(broadcasts, callback=None):
+    """Discover and return devices from recorded broadcasts."""
+    discovery = TuyaDiscovery(callback)
+    for data, addr in broadcasts:
+        discovery.datagram_received(data, addr)
+    await discovery.drain()
+    return discovery.devices
+
+
+async def probe(device, local_key, timeout=PROBE_TIMEOUT) -> dict:
+    """Connect to a discovered device and detect its datapoints."""
+    result = {"gwId": device["gwId"], "ip": device.get("ip")}
+    interface = None
+    try:
+        async with asyncio.timeout(timeout):
+            interface = await pytuya.connect(
+                device["ip"],
+                device["gwId"],
+                local_key,
+                float(device.get("version", 3.3)),
+                False,
+            )
+            result["dps"] = await interface.detect_available_dps()
+    # A failed probe is reported, it must not stop the others.
+    except Exception as ex:  # pylint: disable=broad-except
+        result["error"] = str(ex) or type(ex).__name__
+    finally:
+        if interface:
+            await interface.close()
+    return result
+
+
+async def scan(
+    broadcasts=None,
+    timeout=DEFAULT_TIMEOUT,
+    expected=(),
+    keys=None,
+    concurrency=PROBE_CONCURRENCY,
+    emit=print,
+):
+    """Discover devices and probe the ones with a known local key.
+
+    Devices are discovered from the network, or from recorded broadcasts, and
+    emitted as JSON lines as soon as they are found. Each device is probed as
+    it is found, with at most concurrency probes at a time.
+    """
+    started = time.monotonic()
+    keys = keys or {}
+    semaphore = asyncio.Semaphore(concurrency)
+    probes: dict[str, asyncio.Task] = {}
+
+    async def bounded_probe(device, local_key):
+        async with semaphore:
+            result = await probe(device, local_key)
+        emit(json.dumps({"probe": result}))
+        return result
+
+    def device_found(device):
+        emit(json.dumps({"device": device}))
+        gwid = device.get("gwId")
+        if gwid in keys and gwid not in probes:
+            probes[gwid] = asyncio.create_task(bounded_probe(device, keys[gwid]))
+
+    if broadcasts is None:
+        devices = await discover(timeout, expected, device_found)
+    else:
+        devices = await replay(broadcasts, device_found)
+    results = list(await asyncio.gather(*probes.values()))
+
+    summary = {
+        "devices": len(devices),
+        "probed": len(results),
+        "missing": sorted(set(expected).difference(devices)),
+        "elapsed": round(time.monotonic() - started, 3),
+    }
+    emit(json.dumps({"summary": summary}))
+    return devices, results
+
+
+def main(argv=None):
+    """Discover devices from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m custom_components.localtuya.discovery",
+        description="Stream Tuya devices found on the local network as JSON lines.",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="read recorded broadcasts instead of listening, "
+        "JSON lines of host, port and hex encoded data",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="seconds to listen for broadcasts (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--expect",
+        metavar="DEVICE_ID",
+        action="append",
+        default=[],
+        help="stop listening once every expected device is found, repeatable",
+    )
+    parser.add_argument(
+        "--keys",
+        metavar="FILE",
+        help="JSON object of device ID to local key, these devices are probed",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=PROBE_CONCURRENCY,
+        help="devices probed at once (default: %(default)s)",
+    )
+    parser.add_argument("--debug", action="store_true", help="enable debug logs")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
+    broadcasts = load_broadcasts(args.replay) if args.replay else None
+    keys = None
+    if args.keys:
+        with open(args.keys, encoding="utf-8") as file:
+            keys = json.load(file)
+    asyncio.run(
+        scan(broadcasts, args.timeout, args.expect, keys, max(args.concurrency, 1))
+    )
+
+
+if __name__ == "__main__":
+    main()
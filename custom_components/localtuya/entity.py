@@ -1,9 +1,10 @@
 """Code shared between all platforms."""
 
 import logging
+from collections import ChainMap
 from typing import Any, Coroutine, Callable
 
-from homeassistant.core import HomeAssistant, State
+from homeassistant.core import HomeAssistant, State, callback
 from homeassistant.config_entries import ConfigEntry
 
 from homeassistant.const import (
@@ -22,10 +23,6 @@ from homeassistant.const import (
     ATTR_VIA_DEVICE,
 )
 from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.dispatcher import (
-    async_dispatcher_connect,
-    async_dispatcher_send,
-)
 
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
@@ -86,10 +83,12 @@ async def async_setup_entry(
             dps_config_fields = list(get_dps_for_platform(flow_schema))
 
             for entity_config in entities_to_setup:
+                entity_dps = {entity_config[CONF_ID]}
                 # Add DPS used by this platform to the request list
                 for dp_conf in dps_config_fields:
                     if dp_conf in entity_config:
                         device.dps_to_request[entity_config[dp_conf]] = None
+                        entity_dps.add(entity_config[dp_conf])
 
                 entities.append(
                     entity_class(
@@ -98,6 +97,7 @@ async def async_setup_entry(
                         entity_config[CONF_ID],
                         # we need add_entites_callback in-case we want to add sub-entites, such as electric sensor "phase_a"
                         add_entites_callback=async_add_entities,
+                        dps=entity_dps,
                     )
                 )
     # Once the entities have been created, add to the TuyaDevice instance
@@ -140,7 +140,14 @@ class LocalTuyaEntity(RestoreEntity, pytuya.ContextualLogger):
         self._device_config = DeviceConfig(device_config)
         self._config = get_entity_config(device_config, dp_id)
         self._dp_id = dp_id
-        self._status = {}
+        # The device status is shared by all the entities of the device,
+        # values the entity sets itself only go to its own overlay.
+        self._status = ChainMap({}, device.status)
+        self._dps = {str(dp) for dp in kwargs.get("dps", ()) if dp is not None}
+        self._dps.add(str(dp_id))
+        self._has_status = False
+        self._fingerprint: tuple | None = None
+        self._state_writes = {"written": 0, "suppressed": 0}
         self._state = None
         self._last_state = None
         self._stored_states: State | None = None
@@ -170,30 +177,63 @@ class LocalTuyaEntity(RestoreEntity, pytuya.ContextualLogger):
             self._stored_states = stored_data
             self.status_restored(stored_data)
 
-        def _update_handler(status: dict | None):
-            """Update entity state when status was updated."""
-            last_status = self._status.copy()
-
-            self._status = {} if status is None else {**self._status, **status}
+        self.async_on_remove(self._device.subscribe(self, self._dps))
+
+    @callback
+    def device_status_updated(self, changed: dict | None):
+        """Update entity state, changed holds the updated DPs or None if unavailable."""
+        # A status restored from the profile is shown, but not as available.
+        self._has_status = changed is not None and not self._device.status_restored
+        # Reported values replace the entity's own until it sets them again.
+        overlay = self._status.maps[0]
+        for dp in overlay.keys() & (changed or overlay):
+            del overlay[dp]
+
+        if not self._loaded:
+            self._loaded = True
+            self.connection_made()
+
+        if changed:
+            self.status_updated()
+
+        # A changed DP doesn't always change what this entity shows.
+        fingerprint = self.state_fingerprint()
+        if fingerprint == self._fingerprint:
+            self._state_writes["suppressed"] += 1
+            return
 
-            if not self._loaded:
-                self._loaded = True
-                self.connection_made()
+        super().async_write_ha_state()
+        self._fingerprint = fingerprint
+        self._state_writes["written"] += 1
 
-            if status != last_status:
-                if status:
-                    self.status_updated()
+    def state_fingerprint(self) -> tuple:
+        """Return what this entity writes to the state machine.
 
-                self.schedule_update_ha_state()
+        Override in subclasses if the entity publishes anything else.
+        """
+        return (
+            self.available,
+            self.state,
+            self.capability_attributes,
+            self.state_attributes,
+            self.extra_state_attributes,
+        )
 
-        signal = f"localtuya_{self._device_config.id}"
+    @property
+    def state_writes(self) -> dict[str, int]:
+        """Return the count of written and suppressed state updates."""
+        return self._state_writes
 
-        self.async_on_remove(
-            async_dispatcher_connect(self.hass, signal, _update_handler)
-        )
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state, the next status update will be written too."""
+        self._fingerprint = None
+        super().async_write_ha_state()
 
-        signal = f"localtuya_entity_{self._device_config.id}"
-        async_dispatcher_send(self.hass, signal, self.entity_id)
+    def schedule_update_ha_state(self, force_refresh: bool = False) -> None:
+        """Schedule a state write, the next status update will be written too."""
+        self._fingerprint = None
+        super().schedule_update_ha_state(force_refresh)
 
     @property
     def extra_state_attributes(self):
@@ -208,7 +248,6 @@ class LocalTuyaEntity(RestoreEntity, pytuya.ContextualLogger):
         elif self._last_state is not None:
             attributes[ATTR_STATE] = self._last_state
 
-        self.debug(f"Entity {self.name} - Additional attributes: {attributes}")
         return attributes
 
     @property
@@ -248,7 +287,7 @@ class LocalTuyaEntity(RestoreEntity, pytuya.ContextualLogger):
     @property
     def available(self) -> bool:
         """Return if device is available or not."""
-        return (len(self._status) > 0) or self._device.connected
+        return self._has_status or self._device.connected
 
     @property
     def entity_category(self) -> str:
@@ -326,9 +365,6 @@ class LocalTuyaEntity(RestoreEntity, pytuya.ContextualLogger):
         """
         stored_data = self._stored_states
         if self._status == RESTORE_STATES and stored_data:
-            self._status.pop("0", True)
-            if self._dp_id in self._status:
-                return
             if stored_data.state not in (STATE_UNAVAILABLE, STATE_UNKNOWN):
                 self.debug(f"{self.name}: Restore state: {stored_data.state}")
                 self._status[self._dp_id] = stored_data.state
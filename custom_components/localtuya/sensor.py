@@ -2,7 +2,9 @@
 
 import logging
 import base64
+import time
 from functools import partial
+from statistics import fmean
 from .config_flow import col_to_select
 
 import voluptuous as vol
@@ -23,10 +25,19 @@ from homeassistant.const import (
     UnitOfElectricPotential,
     UnitOfPower,
 )
+from homeassistant.core import callback
 from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import async_call_later
 
 from .entity import LocalTuyaEntity, async_setup_entry
-from .const import CONF_SCALING, CONF_STATE_CLASS
+from .const import (
+    CONF_DEADBAND,
+    CONF_DEADBAND_PERCENT,
+    CONF_PUBLISH_INTERVAL,
+    CONF_SCALING,
+    CONF_STATE_CLASS,
+    CONF_WINDOW_AVERAGE,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -35,6 +46,8 @@ DEFAULT_PRECISION = 2
 ATTR_POWER = "power"
 ATTR_VOLTAGE = "voltage"
 ATTR_CURRENT = "current"
+ATTR_WINDOW_MIN = "window_min"
+ATTR_WINDOW_MAX = "window_max"
 MAP_UOM = {
     ATTR_CURRENT: UnitOfElectricCurrent.AMPERE,
     ATTR_VOLTAGE: UnitOfElectricPotential.VOLT,
@@ -53,6 +66,14 @@ def flow_schema(dps):
         vol.Optional(CONF_SCALING): vol.All(
             vol.Coerce(float), vol.Range(min=-1000000.0, max=1000000.0)
         ),
+        vol.Optional(CONF_PUBLISH_INTERVAL): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=3600)
+        ),
+        vol.Optional(CONF_DEADBAND): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_DEADBAND_PERCENT): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=100)
+        ),
+        vol.Optional(CONF_WINDOW_AVERAGE, default=False): bool,
     }
 
 
@@ -73,6 +94,16 @@ class LocalTuyaSensor(LocalTuyaEntity, SensorEntity):
         self._has_sub_entities = False
         self._attr_device_class = self._config.get(CONF_DEVICE_CLASS)
 
+        # High-frequency readings are held back, see filter_state.
+        self._publish_interval = self._config.get(CONF_PUBLISH_INTERVAL) or 0
+        self._deadband = self._config.get(CONF_DEADBAND) or 0
+        self._deadband_percent = self._config.get(CONF_DEADBAND_PERCENT) or 0
+        self._window_average = self._config.get(CONF_WINDOW_AVERAGE, False)
+        self._samples: list[float] = []
+        self._window: tuple[float, float] | None = None
+        self._published_at = 0.0
+        self._unsub_publish = None
+
     @property
     def native_value(self):
         """Return sensor state."""
@@ -104,11 +135,73 @@ class LocalTuyaSensor(LocalTuyaEntity, SensorEntity):
             if (sub_sensor := getattr(self, "_attr_sub_sensor", None)) and (
                 sub_state := self.decode_base64(state).get(sub_sensor)
             ):
-                self._state = sub_state
+                self._state = self.filter_state(sub_state)
             else:
                 self._state = state
         else:
-            self._state = self.scale(state)
+            self._state = self.filter_state(self.scale(state))
+
+    def filter_state(self, value):
+        """Return the value to publish, the current state if value is held back."""
+        filtered = self._publish_interval or self._deadband or self._deadband_percent
+        numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+        if not filtered or not numeric:
+            self._samples.clear()
+            return value
+
+        self._samples.append(value)
+        if self._state is None or not isinstance(self._state, (int, float)):
+            return self._flush_samples(None)
+
+        # Publish the held values once the interval ends.
+        wait = self._published_at + self._publish_interval - time.monotonic()
+        if wait > 0:
+            if self._unsub_publish is None:
+                self._unsub_publish = async_call_later(
+                    self.hass, wait, self._async_publish_samples
+                )
+            return self._state
+
+        return self._flush_samples(self._state)
+
+    def _flush_samples(self, last):
+        """Return the value of the held samples, last if it's within the deadband."""
+        samples, self._samples = self._samples, []
+        value = samples[-1]
+        if self._window_average:
+            value = round(fmean(samples), DEFAULT_PRECISION)
+
+        if last is not None:
+            deadband = max(self._deadband, abs(last) * self._deadband_percent / 100)
+            if abs(value - last) < deadband:
+                return last
+
+        if self._window_average:
+            self._window = (min(samples), max(samples))
+        self._published_at = time.monotonic()
+        return value
+
+    @callback
+    def _async_publish_samples(self, _now):
+        self._unsub_publish = None
+        if self._samples and (state := self._flush_samples(self._state)) != self._state:
+            self._state = state
+            self.async_write_ha_state()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel the pending publish."""
+        if self._unsub_publish:
+            self._unsub_publish()
+            self._unsub_publish = None
+        await super().async_will_remove_from_hass()
+
+    @property
+    def extra_state_attributes(self):
+        """Return the lowest and highest values of the averaged window."""
+        attributes = super().extra_state_attributes
+        if self._window is not None:
+            attributes[ATTR_WINDOW_MIN], attributes[ATTR_WINDOW_MAX] = self._window
+        return attributes
 
     def status_restored(self, stored_state) -> None:
         super().status_restored(stored_state)
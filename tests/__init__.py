@@ -39,16 +39,15 @@ async def init(config: dict[str, dict[str, Any]], entity_domain, entity_class):
     entry = ConfigEntry(**create_entry(config))
     tuya_api = TuyaCloudApi("EU", "test_client_id", "test_secret", "test_user_id")
 
-    hass.data.setdefault("localtuya", {entry.entry_id: {}})
+    localtuya_hass_data = coordinator.HassLocalTuyaData(tuya_api, {})
+    hass.data.setdefault("localtuya", {entry.entry_id: localtuya_hass_data})
 
     dump_device = coordinator.TuyaDevice(hass, entry, config[DEVICE_NAME])
     dump_device.status_updated = lambda x: [
         [e._status.update(x), e.connection_made(), e.status_updated()]
         for e in get_entites(dump_device)
     ]
-
-    localtuya_hass_data = coordinator.HassLocalTuyaData(tuya_api, {HOST: dump_device})
-    hass.data[DOMAIN][entry.entry_id] = localtuya_hass_data
+    localtuya_hass_data.devices[HOST] = dump_device
 
     await entity.async_setup_entry(
         entity_domain,
@@ -0,0 +1,65 @@
+"""Replay benchmark of discovery over a corpus of broadcasts.
+
+Not collected by pytest, run with: python -m tests.benchmark_discovery
+"""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+from custom_components.localtuya import discovery
+from custom_components.localtuya.discovery import BroadcastDecoder, TuyaDiscovery
+
+from .benchmark_pytuya import bench
+from .test_discovery import load_corpus
+
+
+def bench_decode(packets):
+    """Decode every broadcast of the corpus."""
+    decoder = BroadcastDecoder()
+    bench(
+        f"BroadcastDecoder {len(packets)} broadcasts",
+        lambda: [decoder.decode(data) for data, _ in packets],
+        20,
+    )
+
+
+def bench_replay(packets, rounds=10):
+    """Replay the corpus, the first round discovers the devices."""
+
+    async def replay():
+        found = []
+        discovery = TuyaDiscovery(found.append)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for data, addr in packets:
+                discovery.datagram_received(data, addr)
+            await discovery.drain()
+        elapsed = time.perf_counter() - started
+        return elapsed, len(discovery.devices), len(found)
+
+    for name, burst_size in (("inline", 10**6), ("worker thread", 16)):
+        with patch.object(discovery, "BURST_SIZE", burst_size):
+            elapsed, devices, callbacks = asyncio.run(replay())
+        print(
+            f"{f'replay {rounds} rounds, {name}':<56} {elapsed * 1e3:12.1f} ms"
+            f" ({devices} devices, {callbacks} callbacks)"
+        )
+
+
+def bench_scan(packets):
+    """Scan the corpus, expecting its first device, as the CLI does with --replay."""
+
+    async def scan():
+        decoded = BroadcastDecoder().decode(packets[0][0])
+        await discovery.scan(packets, expected=[decoded["gwId"]], emit=len)
+
+    bench(f"scan {len(packets)} broadcasts", lambda: asyncio.run(scan()), 20)
+
+
+BENCHMARKS = [bench_decode, bench_replay, bench_scan]
+
+if __name__ == "__main__":
+    corpus = load_corpus()
+    for benchmark in BENCHMARKS:
+        benchmark(corpus)
@@ -0,0 +1,187 @@
+"""Micro-benchmarks for pytuya.
+
+Not collected by pytest, run with: python -m tests.benchmark_pytuya
+"""
+
+import asyncio
+import timeit
+import tracemalloc
+from collections import namedtuple
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from custom_components.localtuya import coordinator
+from custom_components.localtuya.const import DOMAIN
+from custom_components.localtuya.core import pytuya
+
+from . import DEVICE_CONFIG, create_entry
+from .test_pytuya import device_frame
+
+
+def bench(name, func, number=200):
+    """Print the best time per call of func."""
+    elapsed = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{name:<56} {elapsed * 1e6:12.1f} us/op")
+
+
+def allocated(name, func, count):
+    """Print the bytes allocated by func per each of count objects."""
+    tracemalloc.start()
+    func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<56} {size / count:12.1f} B")
+
+
+def legacy_split(buffer, data):
+    """Frame splitting as done before FrameDecoder, used as reference."""
+    buffer += data
+    frames = []
+    while buffer:
+        if len(buffer) < 20:
+            break
+        offsets = [buffer.find(pytuya.PREFIX_55AA_BIN), buffer.find(pytuya.PREFIX_6699_BIN)]
+        if offsets[0] != 0 and offsets[1] != 0:
+            buffer = buffer[min(o for o in offsets if o >= 0) :]
+        header = pytuya.parse_header(buffer)
+        if len(buffer) < header.total_length:
+            break
+        frames.append(buffer[: header.total_length])
+        buffer = buffer[header.total_length :]
+    return buffer, frames
+
+
+def bench_frame_decoder():
+    """Coalesced frames in one segment and frames fragmented in small chunks."""
+    for count in (10, 100, 500):
+        stream = b"".join(device_frame(seqno) for seqno in range(count))
+        chunks = [stream[i : i + 7] for i in range(0, len(stream), 7)]
+
+        def coalesced():
+            assert len(pytuya.FrameDecoder().feed(stream)) == count
+
+        def fragmented():
+            decoder = pytuya.FrameDecoder()
+            for chunk in chunks:
+                decoder.feed(chunk)
+
+        def legacy_coalesced():
+            assert len(legacy_split(b"", stream)[1]) == count
+
+        def legacy_fragmented():
+            buffer = b""
+            for chunk in chunks:
+                buffer, _ = legacy_split(buffer, chunk)
+
+        bench(f"FrameDecoder coalesced {count} frames", coalesced, 20)
+        bench(f"legacy coalesced {count} frames", legacy_coalesced, 20)
+        bench(f"FrameDecoder fragmented {count} frames", fragmented, 5)
+        bench(f"legacy fragmented {count} frames", legacy_fragmented, 5)
+
+
+def bench_codec():
+    """Pack and unpack single frames, reported as frames per second."""
+    payload = b'{"dps":{"1":true,"2":500}}' * 4
+    for version in (3.3, 3.4, 3.5):
+        hmac_key = pytuya.AESCipher(b"wV[NcWGUSFF`dSgO") if version >= 3.4 else None
+        frame = device_frame(1, payload=payload, version=version)
+        msg = pytuya.unpack_message(frame, hmac_key=hmac_key)
+        number = 5000
+
+        for name, func in (
+            ("pack", lambda: pytuya.pack_message(msg, hmac_key=hmac_key)),
+            ("unpack", lambda: pytuya.unpack_message(frame, hmac_key=hmac_key)),
+            (
+                "unpack unverified",
+                lambda: pytuya.unpack_message(frame, hmac_key=hmac_key, verify=False),
+            ),
+        ):
+            elapsed = min(timeit.repeat(func, number=number, repeat=5)) / number
+            print(f"{f'{version} {name}':<56} {1 / elapsed:12.0f} frames/s")
+
+
+def bench_generate_payload():
+    """Build heartbeat and CONTROL payloads."""
+
+    async def protocols():
+        return [
+            pytuya.TuyaProtocol(
+                "767823809c9c1f458745",
+                "wV[NcWGUSFF`dSgO",
+                version,
+                False,
+                pytuya.EmptyListener(),
+            )
+            for version in (3.3, 3.5)
+        ]
+
+    for protocol in asyncio.run(protocols()):
+        version = protocol.version
+        dps = {"1": True, "2": 500, "3": "scene data"}
+        bench(
+            f"{version} heartbeat payload",
+            lambda: protocol._generate_payload(pytuya.HEART_BEAT),
+            5000,
+        )
+        bench(
+            f"{version} CONTROL payload",
+            lambda: protocol._generate_payload(pytuya.CONTROL, dps),
+            5000,
+        )
+        bench(
+            f"{version} sub-device CONTROL payload",
+            lambda: protocol._generate_payload(pytuya.CONTROL, dps, nodeId="cid"),
+            5000,
+        )
+
+
+def bench_memory():
+    """Frame records and connected devices."""
+    count = 10000
+    legacy_message = namedtuple(
+        "TuyaMessage", "seqno cmd retcode payload crc crc_good prefix iv"
+    )
+
+    factories = {"TuyaMessage": pytuya.TuyaMessage, "legacy": legacy_message}
+    for name, factory in factories.items():
+        messages = [None] * count
+
+        def create():
+            for index in range(count):
+                messages[index] = factory(1, pytuya.STATUS, 0, b"", 0, True, 0, None)
+
+        allocated(f"{name} per frame", create, count)
+
+    async def connected_devices():
+        """TuyaDevice with its TuyaProtocol and MessageDispatcher."""
+        hass = HomeAssistant("")
+        entry = ConfigEntry(**create_entry({}))
+        hass.data[DOMAIN] = {entry.entry_id: coordinator.HassLocalTuyaData(None, {})}
+        devices = [None] * 100
+
+        def create():
+            for index in range(len(devices)):
+                config = {
+                    **DEVICE_CONFIG,
+                    "device_id": f"{index:020}",
+                    "protocol_version": "3.4",
+                    "entities": [],
+                }
+                device = coordinator.TuyaDevice(hass, entry, config)
+                device._interface = pytuya.TuyaProtocol(
+                    device.id, device.local_key, 3.4, False, device
+                )
+                device._interface.connection_made(asyncio.Transport())
+                devices[index] = device
+
+        allocated("connected device", create, len(devices))
+
+    asyncio.run(connected_devices())
+
+
+BENCHMARKS = [bench_frame_decoder, bench_codec, bench_generate_payload, bench_memory]
+
+if __name__ == "__main__":
+    for benchmark in BENCHMARKS:
+        benchmark()
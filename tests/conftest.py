@@ -0,0 +1,13 @@
+"""Fixtures for localtuya tests."""
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def restore_asyncio():
+    """Restore the asyncio functions init() replaces for the entity tests."""
+    create_task, get_running_loop = asyncio.create_task, asyncio.get_running_loop
+    yield
+    asyncio.create_task, asyncio.get_running_loop = create_task, get_running_loop
@@ -1,6 +1,12 @@
 """Test for localtuya."""
 
+from functools import partial
+from unittest.mock import patch
+
+from homeassistant.helpers.entity import Entity
+
 from . import *
+from custom_components.localtuya import binary_sensor
 from custom_components.localtuya.binary_sensor import (
     LocalTuyaBinarySensor,
     DOMAIN as PLATFORM_DOMAIN,
@@ -41,3 +47,38 @@ async def test_button():
 
     assert entity_1.state == "on"
     assert entity_1.dp_value("1") == STATE_ON
+
+
+async def test_reset_timer():
+    config = {DEVICE_NAME: {**CONFIG[DEVICE_NAME]}}
+    config[DEVICE_NAME]["entities"] = [
+        {**CONFIG[DEVICE_NAME]["entities"][0], "reset_timer": 5}
+    ]
+    device = await init(config, PLATFORM_DOMAIN, LocalTuyaBinarySensor)
+    entity_1, *_ = get_entites(device)
+    # Another entity on the same DP.
+    entity_2 = LocalTuyaBinarySensor(device, config[DEVICE_NAME], "1")
+    for entity in (entity_1, entity_2):
+        device.subscribe(entity, entity._dps)
+
+    status_updated = partial(coordinator.TuyaDevice.status_updated, device)
+    with (
+        patch.object(Entity, "async_write_ha_state"),
+        patch.object(binary_sensor, "async_call_later") as call_later,
+    ):
+        status_updated(DPS_STATUS)
+        assert entity_1.state == "on"
+        assert entity_2.state == "on"
+
+        # The reset only turns off the entity that owns the timer.
+        reset_state = call_later.call_args_list[0].args[2]
+        reset_state(None)
+        assert entity_1.state == "off"
+        assert entity_1.dp_value("1") != STATE_ON
+        assert entity_2.dp_value("1") == STATE_ON
+        assert device.status["1"] == STATE_ON
+
+        # The same value reported again is a new trigger.
+        status_updated(DPS_STATUS)
+        assert entity_1.state == "on"
+        assert entity_1.dp_value("1") == STATE_ON
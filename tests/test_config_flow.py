@@ -0,0 +1,33 @@
+"""Test for localtuya."""
+
+from unittest.mock import patch
+
+from . import *
+from custom_components.localtuya import config_flow
+
+
+async def test_validate_devices():
+    running = {"devices": 0, "max": 0, "hosts": set()}
+
+    async def validate_input(hass, entry_id, data):
+        # Devices of a host are never validated at the same time.
+        assert data["host"] not in running["hosts"]
+        running["hosts"].add(data["host"])
+        running["devices"] += 1
+        running["max"] = max(running["max"], running["devices"])
+        await asyncio.sleep(0.01)
+        running["devices"] -= 1
+        running["hosts"].discard(data["host"])
+        if data["device_id"] == "offline":
+            raise OSError("offline")
+        return {"protocol_version": "3.3"}
+
+    devices = [{"host": f"192.168.1.{i}", "device_id": f"{i}"} for i in range(10)]
+    devices += [{"host": "192.168.1.0", "device_id": "offline"}]
+    with patch.object(config_flow, "validate_input", validate_input):
+        results = await config_flow.validate_devices(None, "entry", devices, limit=4)
+
+    assert running["max"] == 4
+    assert [result for result, _ in results[:10]] == [{"protocol_version": "3.3"}] * 10
+    assert isinstance(results[10][0], OSError)
+    assert all(elapsed >= 0.01 for _, elapsed in results)
@@ -0,0 +1,85 @@
+"""Test for localtuya."""
+
+from unittest.mock import patch
+
+from homeassistant.helpers.entity import Entity
+
+from . import *
+from custom_components.localtuya.binary_sensor import LocalTuyaBinarySensor
+from custom_components.localtuya.coordinator import (
+    BreakerState,
+    CircuitBreaker,
+    TuyaDevice,
+)
+
+ENTITIES = [
+    {
+        "id": "1",
+        "friendly_name": "Button",
+        "platform": "binary_sensor",
+        "state_on": "on",
+    }
+]
+
+
+async def test_circuit_breaker():
+    breaker = CircuitBreaker(threshold=2)
+    breaker.record_failure()
+    assert breaker.state == BreakerState.CLOSED
+
+    with patch("time.monotonic", return_value=100.0):
+        breaker.record_failure()
+    assert breaker.is_open and breaker.opened_at == 100.0
+
+    # A failed half-open attempt opens the breaker from the time it failed.
+    breaker.half_open()
+    with patch("time.monotonic", return_value=200.0):
+        breaker.record_failure()
+    assert breaker.is_open and breaker.opened_at == 200.0
+
+    # A wakeup that comes before the wait isn't lost.
+    breaker.wakeup()
+    await asyncio.wait_for(breaker.wait(60), 1)
+    assert breaker.is_open
+
+    # The wait times out, allowing one attempt.
+    await breaker.wait(0.01)
+    assert breaker.state == BreakerState.HALF_OPEN
+
+
+async def test_dp_triggered_event():
+    config = {
+        DEVICE_NAME: {**DEVICE_CONFIG, "enable_events": True, "entities": ENTITIES}
+    }
+    device = await init(config, "binary_sensor", LocalTuyaBinarySensor)
+    device._interface = Mock(dispatched_dps={"1": "single_click"})
+
+    with patch.object(device, "_fire_event") as fire_event:
+        # Neither the first status nor the one after restoring the profile are triggers.
+        TuyaDevice.status_updated(device, {"1": "single_click"})
+        device._profile_restored = True
+        TuyaDevice.status_updated(device, {"1": "single_click"})
+        fire_event.assert_not_called()
+
+        TuyaDevice.status_updated(device, {"1": "single_click"})
+        fire_event.assert_called_once_with(
+            "device_dp_triggered", {"dp": "1", "value": "single_click"}
+        )
+
+
+async def test_restored_status_unavailable():
+    config = {DEVICE_NAME: {**DEVICE_CONFIG, "entities": ENTITIES}}
+    device = await init(config, "binary_sensor", LocalTuyaBinarySensor)
+    entity, *_ = get_entites(device)
+    device.subscribe(entity, entity._dps)
+
+    with patch.object(Entity, "async_write_ha_state"):
+        # The last known status is shown until the device reports it.
+        device._status.update({"1": "on"})
+        device._profile_restored = True
+        device._dispatch_status()
+        assert entity.is_on
+        assert not entity.available
+
+        TuyaDevice.status_updated(device, {"1": "on"})
+        assert entity.available
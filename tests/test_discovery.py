@@ -1,7 +1,14 @@
 """Test for localtuya."""
 
+import json
+from pathlib import Path
+from unittest.mock import patch
+
 from . import *
-from custom_components.localtuya.discovery import TuyaDiscovery
+from custom_components.localtuya import discovery as discovery_module
+from custom_components.localtuya.discovery import BroadcastDecoder, TuyaDiscovery
+
+CORPUS = Path(__file__).parent / "fixtures" / "discovery_broadcasts.jsonl"
 
 
 DEVICE3_3 = b"\x00\x00U\xaa\x00\x00\x00\x00\x00\x00\x00\x13\x00\x00\x00\x9c\x00\x00\x00\x00\xd0\x97fgo3i\xeb\x10\xb5\xe9\xf12\xfd\x80*\xfcL\xa4\x07\xf4\x8b\x98A\xad\xe0d\xbd\xa76\x9d\xa2\xb6^b\xea\xdc7\x1d\xb4!'\x98\xca\x04+\xff\xc3\xd9I_\xff\x17L)\x02\xe4^;:\xad$\x8f^\xc2\xfb\x84Y\xb1\x15_\xc7]K\xf6i\x9f\x92\xcb\xa4\xc0\xbaR\x01H\x04^v\x05\xfa\x04\x98\xdf\xeaZ\xab\xf1\xb12s\x08\xc3\x92q\x11\xc6!H\x94*+\xc1\x96\xcb\xf5b\x168\xef\x10\x01d\xbb\x81\x94n\xa8]n\xda\x8e\xea@\xe9;\x1e?\xc1J%p\xe1\x82yf3\xd2\xf1\x00\x00\xaaU"
@@ -13,9 +20,108 @@ async def test_dsicovery():
     mock_callback = AsyncMock()
     discovery = TuyaDiscovery(mock_callback)
 
-    discovery.datagram_received(DEVICE3_3, None)
-    discovery.datagram_received(DEVICE3_4, None)
-    discovery.datagram_received(DEVICE3_5, None)
+    discovery.datagram_received(DEVICE3_3, ("192.168.1.39", 6667))
+    discovery.datagram_received(DEVICE3_4, ("192.168.1.36", 6667))
+    discovery.datagram_received(DEVICE3_5, ("192.168.1.104", 6667))
 
     mock_callback.assert_called()
     assert len(discovery.devices) == 3
+
+
+async def test_discovery_repeated_broadcasts():
+    mock_callback = Mock()
+    discovery = TuyaDiscovery(mock_callback)
+    packets = [
+        (DEVICE3_5, ("192.168.1.104", 6667)),
+        (DEVICE3_3, ("192.168.1.39", 6667)),
+        (DEVICE3_4, ("192.168.1.36", 6667)),
+    ]
+
+    for _ in range(3):
+        for data, addr in packets:
+            discovery.datagram_received(data, addr)
+
+    # Repeated broadcasts are only recorded, the callback sees new devices.
+    assert mock_callback.call_count == 3
+    assert len(discovery.last_seen) == 3
+    ips = [device["ip"] for device in discovery.devices.values()]
+    assert ips == ["192.168.1.36", "192.168.1.39", "192.168.1.104"]
+
+    # A device that moved to another IP is reported and sorted again.
+    device = {**discovery.devices["bf36eb3bd9f27a4264yxu1"], "ip": "192.168.1.200"}
+    discovery.device_found(device)
+    assert mock_callback.call_count == 4
+    assert list(discovery.devices)[-1] == "bf36eb3bd9f27a4264yxu1"
+
+
+def load_corpus():
+    """Return the (data, addr) of every broadcast of the corpus."""
+    return discovery_module.load_broadcasts(CORPUS)
+
+
+def test_broadcast_decoder():
+    decoder = BroadcastDecoder()
+    decoded = [decoder.decode(data) for data, _ in load_corpus()]
+
+    devices = [device for device in decoded if device and "gwId" in device]
+    assert {device["version"] for device in devices} == {"3.1", "3.3", "3.4", "3.5"}
+    assert len(devices) == 124
+    # Tuya app broadcasts, a truncated frame and a foreign datagram.
+    assert sum(1 for device in decoded if device and "gwId" not in device) == 4
+    assert decoded.count(None) == 2
+
+
+async def test_discovery_burst():
+    mock_callback = Mock()
+    discovery = TuyaDiscovery(mock_callback)
+
+    with patch.object(discovery_module, "BURST_SIZE", 16):
+        for data, addr in load_corpus() * 2:
+            discovery.datagram_received(data, addr)
+        await discovery.drain()
+
+    assert len(discovery.devices) == 124
+    assert mock_callback.call_count == 124
+
+
+async def test_discovery_order_while_decoding():
+    mock_callback = Mock()
+    discovery = TuyaDiscovery(mock_callback)
+    discovery._decoder = Mock(decode=json.loads)
+    discovery._worker = Mock(decode_many=lambda packets: list(map(json.loads, packets)))
+    ips = ["10.0.0.1", "10.0.0.2"]
+    moved = [json.dumps({"gwId": "dev1", "ip": ip}).encode() for ip in ips]
+
+    with patch.object(discovery_module, "BURST_SIZE", 0):
+        discovery.datagram_received(moved[0], (ips[0], 6667))
+    # The device moved while its previous broadcast is still decoded.
+    discovery.datagram_received(moved[1], (ips[1], 6667))
+    await discovery.drain()
+
+    assert discovery.devices["dev1"]["ip"] == "10.0.0.2"
+    assert mock_callback.call_args.args[0]["ip"] == "10.0.0.2"
+
+
+async def test_scan_replay():
+    corpus = load_corpus()
+    keys = {"bf36eb3bd9f27a4264yxu1": "key"}
+    interface = Mock(detect_available_dps=AsyncMock(return_value={"1": True}))
+    interface.close = AsyncMock()
+    lines = []
+
+    with patch.object(
+        discovery_module.pytuya, "connect", AsyncMock(return_value=interface)
+    ) as connect:
+        devices, probes = await discovery_module.scan(
+            corpus, expected=[*keys, "missing"], keys=keys, emit=lines.append
+        )
+
+    assert len(devices) == 124
+    connect.assert_awaited_once()
+    interface.close.assert_awaited_once()
+    ip = devices["bf36eb3bd9f27a4264yxu1"]["ip"]
+    assert probes == [{"gwId": "bf36eb3bd9f27a4264yxu1", "ip": ip, "dps": {"1": True}}]
+
+    events = [json.loads(line) for line in lines]
+    assert sum(1 for event in events if "device" in event) == 124
+    assert events[-1]["summary"]["missing"] == ["missing"]
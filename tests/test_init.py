@@ -0,0 +1,37 @@
+"""Test for localtuya."""
+
+from . import *
+from custom_components.localtuya import _update_live_devices
+
+
+def live_device(dev_id, host):
+    """Return a running device at host."""
+    device = Mock(id=dev_id, host=host)
+    device.update_host = lambda new_host: setattr(device, "host", new_host)
+    return device
+
+
+def test_update_live_devices():
+    gateway = live_device("gateway", "192.168.1.10")
+    sub_device = live_device("sub_device", "192.168.1.10")
+    devices = {"192.168.1.10": gateway, "192.168.1.10_node": sub_device}
+    hass_data = Mock(devices=devices)
+
+    ids = {"gateway": "", "sub_device": ""}
+    assert _update_live_devices(hass_data, ids, "192.168.1.20", 1.0)
+    assert devices == {"192.168.1.20": gateway, "192.168.1.20_node": sub_device}
+    assert sub_device.host == "192.168.1.20"
+    gateway.discovered.assert_called_once_with(0.0)
+
+
+def test_update_live_devices_swap():
+    device_a = live_device("a", "192.168.1.10")
+    device_b = live_device("b", "192.168.1.11")
+    devices = {"192.168.1.10": device_a, "192.168.1.11": device_b}
+    hass_data = Mock(devices=devices)
+
+    # a moved to the address b still uses, nothing changes and the entry reloads.
+    assert not _update_live_devices(hass_data, {"a": ""}, "192.168.1.11", 1.0)
+    assert devices == {"192.168.1.10": device_a, "192.168.1.11": device_b}
+    assert device_a.host == "192.168.1.10"
+    device_a.discovered.assert_not_called()
@@ -0,0 +1,457 @@
+"""Test for localtuya."""
+
+import asyncio
+import json
+import pytest
+import random
+import struct
+
+from custom_components.localtuya.core import pytuya
+
+LOCAL_KEY = b"wV[NcWGUSFF`dSgO"
+RETCODE = struct.pack(pytuya.MESSAGE_RETCODE_FMT, 0)
+
+
+def device_frame(seqno, payload=b'{"dps":{"1":true}}', version=3.3):
+    """Return a frame as the device would send it."""
+    if version >= 3.5:
+        msg = pytuya.TuyaMessage(
+            seqno, pytuya.STATUS, 0, payload, 0, True, pytuya.PREFIX_6699_VALUE, True
+        )
+        return pytuya.pack_message(msg, hmac_key=LOCAL_KEY)
+
+    hmac_key = LOCAL_KEY if version >= 3.4 else None
+    msg = pytuya.TuyaMessage(
+        seqno, pytuya.STATUS, 0, RETCODE + payload, 0, True, pytuya.PREFIX_55AA_VALUE
+    )
+    return pytuya.pack_message(msg, hmac_key=hmac_key)
+
+
+def decode(decoder: pytuya.FrameDecoder, chunks):
+    """Feed chunks into decoder and return the decoded frames."""
+    frames = []
+    for chunk in chunks:
+        frames.extend(decoder.feed(chunk))
+    return frames
+
+
+def test_frame_decoder_coalesced():
+    frames = [device_frame(seqno, version=v) for seqno, v in enumerate((3.3, 3.5, 3.4))]
+
+    decoded = decode(pytuya.FrameDecoder(), [b"".join(frames)])
+
+    assert [frame for _, frame in decoded] == frames
+    assert [header.seqno for header, _ in decoded] == [0, 1, 2]
+    assert decoded[1][0].prefix == pytuya.PREFIX_6699_VALUE
+
+
+def test_frame_decoder_fragmented():
+    frames = [device_frame(seqno, version=3.5) for seqno in range(3)]
+    stream = b"".join(frames)
+    decoder = pytuya.FrameDecoder()
+
+    decoded = decode(decoder, [stream[i : i + 1] for i in range(len(stream))])
+
+    assert [frame for _, frame in decoded] == frames
+    assert len(decoder) == 0
+
+
+def test_frame_decoder_resync():
+    frame = device_frame(7)
+    decoder = pytuya.FrameDecoder()
+
+    # Junk before the frame and a prefix split across two chunks.
+    assert decode(decoder, [b"garbage\x00\x00"]) == []
+    decoded = decode(decoder, [frame[2:]])
+    assert [frame for _, frame in decoded] == [frame]
+
+    assert decode(decoder, [b"\x00\x00U"]) == []
+    decoded = decode(decoder, [b"\xaa" + frame[4:]])
+    assert [frame for _, frame in decoded] == [frame]
+
+    # Junk without any prefix is dropped.
+    assert decode(decoder, [b"x" * 64]) == []
+    assert len(decoder) < pytuya.FrameDecoder.PREFIX_LEN
+
+
+def test_frame_decoder_corrupted_header():
+    corrupted = pytuya.PREFIX_55AA_BIN + struct.pack(">3I", 1, pytuya.STATUS, 5000)
+    frame = device_frame(8)
+
+    decoded = decode(pytuya.FrameDecoder(), [corrupted + frame])
+
+    assert [frame for _, frame in decoded] == [frame]
+
+
+def test_dispatcher_add_data():
+    received = []
+    dispatcher = pytuya.MessageDispatcher(
+        "device_id", lambda msg, ack=False: received.append(msg), 3.4, LOCAL_KEY
+    )
+    dispatcher.set_logger(pytuya._LOGGER, "device_id")
+    stream = b"".join(device_frame(seqno, version=3.4) for seqno in range(1, 4))
+
+    dispatcher.add_data(stream[:50])
+    assert received == []
+    dispatcher.add_data(stream[50:])
+
+    assert [msg.seqno for msg in received] == [1, 2, 3]
+    assert all(msg.crc_good for msg in received)
+    assert received[0].payload == b'{"dps":{"1":true}}'
+
+
+@pytest.mark.parametrize("version", [3.3, 3.4, 3.5])
+def test_codec_round_trip(version):
+    rnd = random.Random(version)
+    hmac_key = LOCAL_KEY if version >= 3.4 else None
+    prefix = pytuya.PREFIX_6699_VALUE if version >= 3.5 else pytuya.PREFIX_55AA_VALUE
+
+    for _ in range(200):
+        payload = rnd.randbytes(rnd.randint(1, 300))
+        seqno, cmd, retcode = rnd.getrandbits(32), rnd.randint(0, 64), rnd.randint(0, 1)
+        if version >= 3.5:
+            msg = pytuya.TuyaMessage(seqno, cmd, retcode, payload, 0, True, prefix)
+        else:
+            packed = struct.pack(pytuya.MESSAGE_RETCODE_FMT, retcode) + payload
+            msg = pytuya.TuyaMessage(seqno, cmd, None, packed, 0, True, prefix)
+
+        frame = pytuya.pack_message(msg, hmac_key=hmac_key)
+        header = pytuya.parse_header(frame)
+        unpacked = pytuya.unpack_message(frame, hmac_key=hmac_key)
+
+        assert header.total_length == len(frame)
+        assert (unpacked.seqno, unpacked.cmd, unpacked.retcode) == (seqno, cmd, retcode)
+        assert (unpacked.payload, unpacked.prefix) == (payload, prefix)
+        assert unpacked.crc_good
+
+    # A length shorter than the trailer is rejected instead of read past.
+    frame = bytearray(device_frame(1, version=version))
+    struct.pack_into(">I", frame, 12 if version < 3.5 else 14, 4)
+    with pytest.raises(pytuya.DecodeError):
+        pytuya.unpack_message(
+            bytes(frame), hmac_key=LOCAL_KEY if version >= 3.4 else None
+        )
+
+
+@pytest.mark.parametrize(
+    "verification, dispatched, dropped",
+    [("strict", [1, 3], 1), ("warn", [1, 2, 3], 0), ("off", [1, 2, 3], 0)],
+)
+def test_dispatcher_verification(verification, dispatched, dropped):
+    received = []
+    dispatcher = pytuya.MessageDispatcher(
+        "device_id", lambda msg, ack=False: received.append(msg), 3.4, LOCAL_KEY
+    )
+    dispatcher.set_logger(pytuya._LOGGER, "device_id")
+    dispatcher.verification = pytuya.FrameVerification(verification)
+    corrupted = bytearray(device_frame(2, version=3.4))
+    corrupted[-10] ^= 0xFF  # Inside the HMAC.
+
+    dispatcher.add_data(device_frame(1, version=3.4))
+    dispatcher.add_data(bytes(corrupted) + device_frame(3, version=3.4))
+
+    assert [msg.seqno for msg in received] == dispatched
+    failed = 0 if verification == "off" else 1
+    assert dispatcher.frame_stats == {
+        "received": 3,
+        "failed": failed,
+        "dropped": dropped,
+    }
+
+
+def test_dispatcher_undecodable_frame():
+    received = []
+    dispatcher = pytuya.MessageDispatcher(
+        "device_id", lambda msg, ack=False: received.append(msg), 3.3, LOCAL_KEY
+    )
+    dispatcher.set_logger(pytuya._LOGGER, "device_id")
+    # A length shorter than the retcode and CRC.
+    corrupted = bytearray(device_frame(1))
+    struct.pack_into(">I", corrupted, 12, 4)
+
+    dispatcher.add_data(bytes(corrupted) + device_frame(2))
+
+    assert [msg.seqno for msg in received] == [2]
+    assert dispatcher.frame_stats == {"received": 2, "failed": 1, "dropped": 1}
+
+
+def test_cipher_context_reuse():
+    cipher = pytuya.AESCipher(LOCAL_KEY)
+
+    for payload in (b'{"dps":{"1":true}}', b"x" * 16, b""):
+        encrypted = cipher.encrypt(payload, False)
+        assert pytuya.AESCipher(LOCAL_KEY).decrypt(encrypted, False, False) == payload
+        assert cipher.decrypt(encrypted, False, False) == payload
+
+    iv = b"0123456789ab"
+    encrypted = cipher.encrypt(b"payload", False, pad=False, iv=iv, header=b"aad")
+    assert cipher.decrypt(encrypted[12:-16], False, False, iv, b"aad", encrypted[-16:])
+
+    # Unaligned data must not corrupt the shared ECB context.
+    with pytest.raises(ValueError):
+        cipher.decrypt(b"x" * 15, False)
+    assert cipher.decrypt(cipher.encrypt(b"ok", False), False) == "ok"
+
+
+async def test_generate_payload():
+    protocol = pytuya.TuyaProtocol(
+        "device_id", LOCAL_KEY.decode(), 3.4, False, pytuya.EmptyListener()
+    )
+
+    payload = protocol._generate_payload(pytuya.CONTROL, {"1": "a b"}, nodeId="cid")
+    assert payload.cmd == pytuya.CONTROL_NEW
+    assert json.loads(payload.payload)["data"] == {"cid": "cid", "dps": {"1": "a b"}}
+    assert b" " not in protocol._generate_payload(pytuya.HEART_BEAT).payload
+
+    # Templates must not be modified by generated payloads.
+    _, template = pytuya.get_payload_template("v3.4", pytuya.CONTROL)
+    assert template == {"protocol": 5, "t": "int", "data": {"cid": ""}}
+
+
+async def test_dispatcher_waiters():
+    dispatcher = pytuya.MessageDispatcher("device_id", lambda *_, **__: None, 3.3, b"")
+    dispatcher.set_logger(pytuya._LOGGER, "device_id")
+    heartbeat = pytuya.MessageDispatcher.HEARTBEAT_SEQNO
+    msg = pytuya.TuyaMessage(0, pytuya.HEART_BEAT, 0, b"", 0, True, 0)
+
+    # Several clients can wait for the same pseudo sequence number.
+    waiters = [dispatcher.create_waiter(heartbeat) for _ in range(3)]
+    waiters[0].cancel()
+    dispatcher._dispatch(msg)
+    assert [await waiter for waiter in waiters[1:]] == [msg, msg]
+    await asyncio.sleep(0)
+    assert dispatcher.listeners == {}
+
+    with pytest.raises(TimeoutError):
+        await dispatcher.wait_for(1, pytuya.DP_QUERY, timeout=0.01)
+    assert dispatcher.listeners == {}
+
+    # The timeout starts once the request is written, not when the waiter is created.
+    waiter = dispatcher.create_waiter(2)
+    await asyncio.sleep(0.02)
+    dispatcher.start_timeout(waiter, 2, pytuya.CONTROL, timeout=0.01)
+    assert not waiter.done()
+    with pytest.raises(TimeoutError):
+        await waiter
+
+    waiter = dispatcher.create_waiter(3)
+    dispatcher.abort()
+    assert await waiter is None
+
+
+async def test_write_pacer():
+    loop = asyncio.get_running_loop()
+    pacer = pytuya.WritePacer(interval=0.02, burst=2)
+    released = []
+
+    async def write(index):
+        await pacer.wait()
+        released.append((index, loop.time()))
+
+    started = loop.time()
+    await asyncio.gather(*(write(index) for index in range(5)))
+
+    # Two writes at once, then one each interval, in order and never early.
+    assert [index for index, _ in released] == list(range(5))
+    delays = [at - started for _, at in released]
+    assert delays[1] < 0.02
+    assert all(delays[index] >= (index - 1) * 0.02 for index in range(2, 5))
+    assert pacer.stats["writes"] == 5
+    assert pacer.stats["delayed"] == 3
+    assert pacer.stats["max_wait_ms"] >= 60
+
+
+async def test_status_many():
+    protocol = pytuya.TuyaProtocol(
+        "device_id", LOCAL_KEY.decode(), 3.3, False, pytuya.EmptyListener()
+    )
+    in_flight = max_in_flight = 0
+
+    async def status(cid=None):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if cid == "timeout":
+            raise TimeoutError
+        return {} if cid == "absent" else {"1": cid}
+
+    protocol.status = status
+    cids = [f"cid{i}" for i in range(10)] + ["absent", "timeout"]
+
+    result = await protocol.status_many(cids, limit=3)
+
+    assert result == {f"cid{i}": {"1": f"cid{i}"} for i in range(10)}
+    assert max_in_flight == 3
+
+
+class FakeTransport(asyncio.Transport):
+    """Transport recording each write call."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append([data])
+
+    def writelines(self, list_of_data):
+        self.writes.append(list(list_of_data))
+
+    def is_closing(self):
+        return False
+
+
+@pytest.mark.parametrize("batch_writes", [True, False])
+async def test_concurrent_writers(batch_writes):
+    loop = asyncio.get_running_loop()
+    protocol = pytuya.TuyaProtocol(
+        "device_id", LOCAL_KEY.decode(), 3.3, False, pytuya.EmptyListener()
+    )
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+    protocol.batch_writes = batch_writes
+    written_at = []
+    transport.write = lambda data: written_at.append((loop.time(), [data]))
+    transport.writelines = lambda frames: written_at.append((loop.time(), frames))
+
+    await asyncio.gather(
+        protocol.transport_writelines([b"a1", b"a2"]),
+        protocol.transport_write(b"b"),
+        protocol.transport_write(b"c"),
+    )
+
+    # Only the frames of one writer share a write, the writes are paced.
+    writes = [frames for _, frames in written_at]
+    if batch_writes:
+        assert writes == [[b"a1", b"a2"], [b"b"], [b"c"]]
+    else:
+        assert writes == [[b"a1"], [b"a2"], [b"b"], [b"c"]]
+    times = [at for at, _ in written_at]
+    gaps = [after - before for before, after in zip(times, times[1:])]
+    assert all(gap >= pytuya.MIN_COMMAND_INTERVAL for gap in gaps)
+
+
+async def test_exchange_cancelled_while_writing():
+    protocol = pytuya.TuyaProtocol(
+        "device_id", LOCAL_KEY.decode(), 3.3, False, pytuya.EmptyListener()
+    )
+    protocol.connection_made(FakeTransport())
+    query = protocol._generate_payload(pytuya.DP_QUERY)
+
+    # The writes are blocked by another writer, then the callers give up.
+    async with protocol._write_lock:
+        tasks = [
+            asyncio.create_task(protocol.exchange(pytuya.HEART_BEAT)),
+            asyncio.create_task(protocol.exchange_many([query, query])),
+        ]
+        await asyncio.sleep(0.01)
+        assert protocol.dispatcher.listeners
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    await asyncio.sleep(0)
+    assert all(task.cancelled() for task in tasks)
+    assert protocol.dispatcher.listeners == {}
+
+
+async def answer_queries(protocol, transport, writes):
+    """Answer the DP_QUERY frames of writes transport writes, as a gateway would.
+
+    Sub-device "absent" has no DPs and "missing" isn't known to the gateway.
+    """
+    cipher = pytuya.AESCipher(LOCAL_KEY)
+    answered = 0
+    while answered < writes:
+        await asyncio.sleep(0.001)
+        for frames in transport.writes[answered:]:
+            for frame in frames:
+                query = pytuya.unpack_message(frame, no_retcode=True)
+                cid = json.loads(cipher.decrypt(query.payload, False))["cid"]
+                dps = {} if cid == "absent" else {"1": cid}
+                response = json.dumps({"cid": cid, "dps": dps}).encode()
+                if cid == "missing":
+                    response = b"devid not found"
+                payload = RETCODE + cipher.encrypt(response, False)
+                msg = pytuya.TuyaMessage(query.seqno, query.cmd, 0, payload, 0)
+                protocol.data_received(pytuya.pack_message(msg))
+            answered += 1
+
+
+async def test_status_many_batched():
+    protocol = pytuya.TuyaProtocol(
+        "device_id", LOCAL_KEY.decode(), 3.3, False, pytuya.EmptyListener()
+    )
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+    protocol.batch_writes = True
+
+    cids = [f"cid{i}" for i in range(5)] + ["absent"]
+    responder = asyncio.create_task(answer_queries(protocol, transport, 2))
+    result = await protocol.status_many(cids, limit=3)
+    await responder
+
+    assert result == {f"cid{i}": {"1": f"cid{i}"} for i in range(5)}
+    # One write per batch, with consecutive sequence numbers.
+    assert [len(frames) for frames in transport.writes] == [3, 3]
+    seqnos = [pytuya.parse_header(f).seqno for w in transport.writes for f in w]
+    assert seqnos == list(range(1, 7))
+
+
+@pytest.mark.parametrize("batch_writes, writes", [(True, 1), (False, 3)])
+async def test_status_many_unknown_cid(batch_writes, writes):
+    protocol = pytuya.TuyaProtocol(
+        "device_id", LOCAL_KEY.decode(), 3.3, False, pytuya.EmptyListener()
+    )
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+    protocol.batch_writes = batch_writes
+
+    # An unknown sub-device doesn't fail the queries of the others.
+    cids = ["cid0", "missing", "cid1"]
+    responder = asyncio.create_task(answer_queries(protocol, transport, writes))
+    result = await protocol.status_many(cids)
+    await responder
+
+    assert result == {"cid0": {"1": "cid0"}, "cid1": {"1": "cid1"}}
+
+
+@pytest.mark.parametrize(
+    "dev_type, known_dps, queries",
+    [
+        # A single answer holds every DP.
+        ("v3.4", None, 1),
+        # Base ranges, 100-140 and 150-170 while they have DPs.
+        ("type_0d", None, 9),
+        # The DPs of the product, all answered at once.
+        ("type_0d", ["1", "2", "3", "101", "102", "103", "151", "152"], 1),
+        # A known DP the device lacks, falls back to the ranges.
+        ("type_0d", ["1", "2", "3", "4"], 10),
+    ],
+)
+async def test_detect_available_dps(dev_type, known_dps, queries):
+    protocol = pytuya.TuyaProtocol(
+        "device_id", LOCAL_KEY.decode(), 3.3, False, pytuya.EmptyListener()
+    )
+    protocol.dev_type = dev_type
+    device_dps = ["1", "2", "3", *map(str, range(101, 131)), "151", "152"]
+    if known_dps and "4" not in known_dps:
+        device_dps = known_dps
+    requests = []
+
+    async def status(cid=None):
+        """type_0d devices only answer with the requested DPs."""
+        requests.append(dict(protocol.dps_to_request))
+        cache = protocol.dps_cache.setdefault("parent", {})
+        for dp in device_dps:
+            if dev_type != "type_0d" or dp in protocol.dps_to_request:
+                cache[dp] = 0
+        return cache
+
+    protocol.status = status
+    detected = await protocol.detect_available_dps(known_dps=known_dps)
+
+    assert sorted(detected, key=int) == device_dps
+    assert len(requests) == queries
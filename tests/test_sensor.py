@@ -0,0 +1,50 @@
+"""Test for localtuya."""
+
+from . import *
+from custom_components.localtuya.sensor import (
+    LocalTuyaSensor,
+    DOMAIN as PLATFORM_DOMAIN,
+)
+
+CONFIG = {
+    DEVICE_NAME: {
+        **DEVICE_CONFIG,
+        "entities": [
+            {
+                "entity_category": "None",
+                "friendly_name": f"{PLATFORM_DOMAIN} 1",
+                "icon": "",
+                "id": "1",
+                "scaling": 0.1,
+                "deadband": 1,
+                "deadband_percent": 10,
+                "platform": PLATFORM_DOMAIN,
+            }
+        ],
+    }
+}
+
+
+async def test_sensor_deadband():
+    device = await init(CONFIG, PLATFORM_DOMAIN, LocalTuyaSensor)
+    entities: list[LocalTuyaSensor] = get_entites(device)
+
+    assert len(entities) > 0
+    entity_1, *_ = entities
+    assert type(entity_1) is LocalTuyaSensor
+
+    device.status_updated({"1": 50})
+    assert entity_1.native_value == 5
+    # Below the absolute deadband.
+    device.status_updated({"1": 55})
+    assert entity_1.native_value == 5
+    device.status_updated({"1": 60})
+    assert entity_1.native_value == 6
+
+    device.status_updated({"1": 1000})
+    assert entity_1.native_value == 100
+    # Below 10% of the current state.
+    device.status_updated({"1": 1050})
+    assert entity_1.native_value == 100
+    device.status_updated({"1": 1100})
+    assert entity_1.native_value == 110